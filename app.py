@@ -1,3 +1,8 @@
+import time
+_SCRIPT_START = time.perf_counter() # Start of this script run; cold-start fallback where /proc is unavailable
+
+import os
+import sys
 import streamlit as st
 import nest_asyncio # Import nest_asyncio
 nest_asyncio.apply() # Apply the patch
@@ -11,14 +16,55 @@ from auth import init_db, render_login_page
 # Import UI rendering functions
 from ui import load_css, render_main_app
 
-# Import utility and processing functions
-from utils import process_user_question, process_uploaded_pdfs
+# utils (and through it LangChain, FAISS and PyPDF2) is imported inside the callbacks
+# below, so the login page renders without loading the heavy RAG dependencies.
+
+# --- One-time Process Initialization ---
+@st.cache_resource
+def initialize_database():
+    """Creates the database tables once per server process instead of on every rerun."""
+    init_db()
+    return True
+
+@st.cache_resource
+def get_startup_metrics():
+    """Process-wide record of the first completed render (time-to-first-paint)."""
+    return {}
+
+def process_age():
+    """Seconds since this process started, so interpreter start, Streamlit server boot and
+       imports are included. Read from /proc (Linux); None where that isn't available.
+    """
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Fields after the parenthesised command name start at field 3; starttime is field 22
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def record_startup_time(page):
+    """Reports how long after process start the first page of this process was rendered."""
+    metrics = get_startup_metrics()
+    if metrics:
+        return
+    age = process_age()
+    if age is None:
+        age, since = time.perf_counter() - _SCRIPT_START, "first_run"
+    else:
+        since = "process_start"
+    metrics["first_paint_s"] = round(age, 3)
+    metrics["page"] = page
+    print(f"STARTUP first_paint_s={metrics['first_paint_s']} since={since} page={page}", file=sys.stderr, flush=True)
+    st.session_state.debug_logs.append(f"STARTUP: first page ({page}) rendered {metrics['first_paint_s']}s after {since.replace('_', ' ')}")
 
 # --- Session State Initialization ---
 def initialize_session_state():
     """Initialize session state variables if they don't exist."""
     defaults = {
-        'conversation_history': [],
+        'history_pages': 1, # Pages of stored chat history currently shown
         'vector_store_created': False, # Tracks if VS is loaded/created *in this session*
         # 'processed_files': set(), # No longer needed, using DB
         # 'current_pdfs': None, # No longer needed, using DB filenames
@@ -46,6 +92,8 @@ def handle_pdf_processing(pdf_docs):
         st.error("User session invalid. Please log in again.")
         return
 
+    from utils import process_uploaded_pdfs
+
     # Call the actual processing function from utils, passing username and api_key
     success = process_uploaded_pdfs(pdf_docs, username, api_key)
     if success:
@@ -62,6 +110,8 @@ def handle_question_processing(prompt):
         st.error("User session invalid. Please log in again.")
         return
 
+    from utils import process_user_question
+
     # Call the actual processing function from utils
     # pdf_docs are no longer needed here, context comes from user's vector store
     process_user_question(prompt, username, api_key)
@@ -78,19 +128,21 @@ def main():
     # Load custom CSS
     st.markdown(load_css(), unsafe_allow_html=True)
 
-    # Initialize database and session state
-    init_db()
+    # Initialize database (once per process) and session state
+    initialize_database()
     initialize_session_state()
 
     # Check login status and render appropriate page
     if not st.session_state.logged_in:
         render_login_page()
+        record_startup_time("login")
     else:
         # Pass the callback functions to the main app renderer
         render_main_app(
             process_pdf_callback=handle_pdf_processing,
             process_question_callback=handle_question_processing
         )
+        record_startup_time("main")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,123 @@
+"""Compare PDF extraction backends on a fixed local corpus.
+
+Usage:
+    python benchmarks/bench_extraction.py CORPUS_DIR [--backends pypdf2,pypdfium2,pdfminer] [--repeat 3] [--json out.json]
+
+For each backend this reports pages/sec and a text fidelity score per corpus.
+Fidelity is the word-level F1 against a ground-truth `<name>.txt` next to each
+PDF when one exists, otherwise against the output of the reference backend
+(the first one listed). Backends whose package isn't installed are skipped.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.extractors import EXTRACTORS, extract_text, get_extractor
+
+
+def word_f1(candidate, reference):
+    """Bag-of-words F1 between two texts; 1.0 means the same words in any order."""
+    cand = Counter(re.findall(r"\w+", candidate.lower()))
+    ref = Counter(re.findall(r"\w+", reference.lower()))
+    if not cand and not ref:
+        return 1.0
+    overlap = sum((cand & ref).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(cand.values())
+    recall = overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+def find_corpus(root):
+    pdfs = []
+    for dirpath, _, filenames in os.walk(root):
+        pdfs.extend(os.path.join(dirpath, name) for name in filenames if name.lower().endswith(".pdf"))
+    return sorted(pdfs)
+
+def run_backend(backend, pdfs, repeat, page_timeout):
+    """Extracts the whole corpus `repeat` times; returns (texts, pages, best seconds, skipped pages)."""
+    extractor = get_extractor(backend)
+    pages = 0
+    for path in pdfs:
+        with open(path, "rb") as f:
+            document = extractor.open(f)
+            pages += extractor.page_count(document)
+            extractor.close(document)
+
+    best = None
+    for _ in range(repeat):
+        texts = {}
+        skipped = 0
+        start = time.perf_counter()
+        for path in pdfs:
+            try:
+                text, skipped_pages = extract_text(path, backend=backend, page_timeout=page_timeout)
+            except Exception as e:
+                print(f"  {backend}: failed on {path}: {e}", file=sys.stderr)
+                text, skipped_pages = "", []
+            texts[path] = text
+            skipped += len(skipped_pages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return texts, pages, best, skipped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory of PDFs (optionally with <name>.txt ground truth).")
+    parser.add_argument("--backends", default=",".join(EXTRACTORS), help="Comma-separated backends; the first is the reference.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per backend; the fastest is reported.")
+    parser.add_argument("--page-timeout", type=float, default=None, help="Per-page timeout in seconds (default: none).")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    pdfs = find_corpus(args.corpus)
+    if not pdfs:
+        sys.exit(f"No PDF files found under '{args.corpus}'.")
+
+    outputs = {}
+    rows = []
+    for backend in args.backends.split(","):
+        try:
+            texts, pages, seconds, skipped = run_backend(backend, pdfs, args.repeat, args.page_timeout)
+        except ImportError as e:
+            print(f"Skipping {backend}: {e}", file=sys.stderr)
+            continue
+        outputs[backend] = texts
+        rows.append({"backend": backend, "pages": pages, "seconds": round(seconds, 4),
+                     "pages_per_sec": round(pages / seconds, 2) if seconds else None,
+                     "skipped_pages": skipped})
+
+    if not rows:
+        sys.exit("None of the requested backends are installed.")
+
+    reference = rows[0]["backend"]
+    for row in rows:
+        scores = []
+        for path in pdfs:
+            truth_path = os.path.splitext(path)[0] + ".txt"
+            if os.path.exists(truth_path):
+                with open(truth_path, "r", encoding="utf-8") as f:
+                    truth = f.read()
+            else:
+                truth = outputs[reference][path]
+            scores.append(word_f1(outputs[row["backend"]][path], truth))
+        row["fidelity"] = round(sum(scores) / len(scores), 4)
+
+    print(f"{len(pdfs)} PDFs, fidelity vs ground truth where present, else vs '{reference}'")
+    print(f"{'backend':<12}{'pages':>8}{'seconds':>10}{'pages/sec':>12}{'fidelity':>10}{'skipped':>9}")
+    for row in rows:
+        print(f"{row['backend']:<12}{row['pages']:>8}{row['seconds']:>10.3f}{row['pages_per_sec'] or 0:>12.1f}"
+              f"{row['fidelity']:>10.3f}{row['skipped_pages']:>9}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"corpus": args.corpus, "documents": len(pdfs), "reference": reference, "results": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
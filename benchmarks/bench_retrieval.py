@@ -0,0 +1,147 @@
+"""Compare flat MMR search with two-stage (document, then chunk) retrieval.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--documents 2000] [--chunks-per-doc 40] [--dim 768]
+                                         [--topics 50] [--queries 200] [--doc-top-k 1,3,5,10] [--json out.json]
+
+Builds a synthetic corpus where documents cluster around shared topics (so
+neighbouring documents compete for the same questions), each document's chunks
+are noisy variations of the document's vector, and each query is a noisy copy of
+one chunk. No API key is needed. For each configuration it reports per-query
+latency and:
+  * precision: share of returned chunks that come from the query's document
+  * hit rate:  share of queries whose source chunk is among the returned chunks
+
+Both methods run the engine's own path: a UserIndex (engine/store.py) over a FAISS
+IndexFlatL2 with an in-memory docstore shaped like LangChain's, searched the way
+RAGEngine.retrieve does it (nearest_positions or select_documents + positions_for,
+then chunk_vectors, search_chunks and documents). The one-time cost of building
+the source -> positions map on the first two-stage query is reported separately.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.retrieval import normalize, build_document_index, select_documents, search_chunks
+from engine.store import UserIndex
+
+
+def make_corpus(documents, chunks_per_doc, dim, topics, doc_spread, chunk_noise, seed):
+    rng = np.random.default_rng(seed)
+    topic_vectors = normalize(rng.standard_normal((topics, dim)))
+    doc_topics = rng.integers(topics, size=documents)
+    doc_vectors = normalize(topic_vectors[doc_topics] + doc_spread * rng.standard_normal((documents, dim)) / np.sqrt(dim))
+    sources = np.repeat(np.arange(documents), chunks_per_doc)
+    vectors = normalize(doc_vectors[sources] + chunk_noise * rng.standard_normal((len(sources), dim)) / np.sqrt(dim))
+    return vectors, sources
+
+def make_queries(vectors, count, query_noise, seed):
+    rng = np.random.default_rng(seed + 1)
+    targets = rng.choice(len(vectors), size=count, replace=False)
+    noise = query_noise * rng.standard_normal((count, vectors.shape[1])) / np.sqrt(vectors.shape[1])
+    return normalize(vectors[targets] + noise), targets
+
+def make_user_index(vectors, sources):
+    """A UserIndex like load_user_index returns, without LangChain or an embeddings client."""
+    import faiss
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    filenames = [f"doc-{source}.pdf" for source in sources.tolist()]
+    docs = {str(position): SimpleNamespace(page_content="", metadata={"source": filename, "chunk_index": position})
+            for position, filename in enumerate(filenames)}
+    vector_store = SimpleNamespace(
+        index=index,
+        docstore=SimpleNamespace(search=docs.__getitem__),
+        index_to_docstore_id={position: str(position) for position in range(len(filenames))},
+    )
+    return UserIndex(vector_store, build_document_index(vectors, filenames))
+
+def flat_searcher(user_index):
+    def search(query, k, fetch_k, lambda_mult):
+        positions = user_index.nearest_positions(query, fetch_k)
+        picked, _ = search_chunks(query, user_index.chunk_vectors(positions), k, fetch_k, lambda_mult)
+        found = [positions[i] for i in picked]
+        user_index.documents(found)
+        return np.array(found)
+    return search
+
+def two_stage_searcher(user_index, doc_top_k):
+    def search(query, k, fetch_k, lambda_mult):
+        rows = select_documents(query, user_index.doc_centroids, doc_top_k)
+        positions = user_index.positions_for([user_index.doc_sources[row] for row in rows])
+        picked, _ = search_chunks(query, user_index.chunk_vectors(positions), k, fetch_k, lambda_mult)
+        found = [positions[i] for i in picked]
+        user_index.documents(found)
+        return np.array(found)
+    return search
+
+def evaluate(name, search, queries, targets, sources, k, fetch_k, lambda_mult):
+    latencies = []
+    precision = []
+    hits = 0
+    for query, target in zip(queries, targets):
+        start = time.perf_counter()
+        found = search(query, k, fetch_k, lambda_mult)
+        latencies.append(time.perf_counter() - start)
+        precision.append(float(np.mean(sources[found] == sources[target])))
+        hits += int(target in set(found.tolist()))
+    latencies = np.array(latencies) * 1000
+    return {
+        "method": name,
+        "mean_ms": round(float(latencies.mean()), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "precision": round(float(np.mean(precision)), 4),
+        "hit_rate": round(hits / len(targets), 4),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--chunks-per-doc", type=int, default=40)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--topics", type=int, default=50, help="Shared topics the documents cluster around.")
+    parser.add_argument("--doc-spread", type=float, default=0.7, help="Spread of documents around their topic.")
+    parser.add_argument("--chunk-noise", type=float, default=1.5, help="Spread of chunks around their document.")
+    parser.add_argument("--query-noise", type=float, default=2.0, help="Distance of each query from its source chunk.")
+    parser.add_argument("--doc-top-k", default="1,3,5,10", help="Comma-separated first-stage sizes to try.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    vectors, sources = make_corpus(args.documents, args.chunks_per_doc, args.dim, args.topics,
+                                   args.doc_spread, args.chunk_noise, args.seed)
+    queries, targets = make_queries(vectors, args.queries, args.query_noise, args.seed)
+    user_index = make_user_index(vectors, sources)
+
+    rows = [evaluate("flat", flat_searcher(user_index), queries, targets, sources, args.k, args.fetch_k, args.lambda_mult)]
+    start = time.perf_counter()
+    user_index.positions_for([])
+    positions_build_ms = (time.perf_counter() - start) * 1000
+    for doc_top_k in [int(value) for value in args.doc_top_k.split(",")]:
+        rows.append(evaluate(f"two-stage doc_top_k={doc_top_k}", two_stage_searcher(user_index, doc_top_k),
+                             queries, targets, sources, args.k, args.fetch_k, args.lambda_mult))
+
+    print(f"{args.documents} documents x {args.chunks_per_doc} chunks, dim {args.dim}, {args.queries} queries, "
+          f"k={args.k}, fetch_k={args.fetch_k}")
+    print(f"First two-stage query also builds the source -> positions map: {positions_build_ms:.1f} ms (once per loaded index)")
+    print(f"{'method':<26}{'mean ms':>10}{'p95 ms':>10}{'precision':>11}{'hit rate':>10}")
+    for row in rows:
+        print(f"{row['method']:<26}{row['mean_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['precision']:>11.3f}{row['hit_rate']:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "positions_build_ms": round(positions_build_ms, 3), "results": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""Command-line entry point for bulk ingest and batch question answering.
+
+Examples:
+    python cli.py ingest --user alice --workers 8 ./manuals
+    python cli.py ask --user alice --questions questions.jsonl --output answers.jsonl --concurrency 16
+    python cli.py gate-stats --user alice --thresholds 0.35,0.4,0.45,0.5
+    python cli.py reindex --dry-run
+    python cli.py publish-snapshots --snapshot-path /mnt/index_snapshots
+    python cli.py sync-snapshots --snapshot-path /mnt/index_snapshots --watch 30
+    python cli.py rollback --user alice
+    python cli.py serve --port 8765
+
+The API key is taken from --api-key, then the GOOGLE_API_KEY environment
+variable, then the key stored for the user in the database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import RELEVANCE_THRESHOLD, SNAPSHOT_STORE, SNAPSHOT_STORE_PATH, ENGINE_HOST, ENGINE_PORT
+from db import init_db, get_user, has_user, add_user, update_api_key, get_gate_decisions, get_usernames_with_pdfs
+from engine import get_engine, make_server
+from engine import snapshots, store
+from engine.fingerprint import CURRENT, index_status
+
+
+# --- Helpers ---
+
+def resolve_api_key(username, api_key):
+    """Picks the API key for a run and makes sure the user exists in the database."""
+    api_key = api_key or os.environ.get("GOOGLE_API_KEY") or get_user(username)
+    if not api_key:
+        sys.exit(f"No API key for '{username}'. Pass --api-key or set GOOGLE_API_KEY.")
+    if not has_user(username):
+        add_user(username)
+    if not get_user(username):
+        update_api_key(username, api_key)
+    return api_key
+
+def find_pdfs(root):
+    """Returns (relative path, absolute path) for every PDF under root, sorted by path.
+       The relative path is used as the filename so identically named files in
+       different folders don't collide.
+    """
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(".pdf"):
+                path = os.path.join(dirpath, name)
+                found.append((os.path.relpath(path, root).replace(os.sep, "/"), path))
+    return sorted(found)
+
+def read_questions(path):
+    """Reads a JSONL file of {"question": ..., "id": ...} objects or bare question strings;
+       "id" is optional. Invalid lines are all reported, by line number, before any
+       question is answered.
+    """
+    questions = []
+    problems = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                problems.append(f"line {line_no}: invalid JSON ({e.msg})")
+                continue
+            if isinstance(record, str):
+                record = {"question": record}
+            if not isinstance(record, dict):
+                problems.append(f"line {line_no}: expected an object or a string, not {type(record).__name__}")
+                continue
+            if not isinstance(record.get("question"), str) or not record["question"].strip():
+                problems.append(f'line {line_no}: missing a "question" string')
+                continue
+            record.setdefault("id", line_no)
+            questions.append(record)
+    if problems:
+        sys.exit(f"Invalid questions in '{path}':\n" + "\n".join(problems))
+    return questions
+
+
+# --- Commands ---
+
+def cmd_ingest(args):
+    api_key = resolve_api_key(args.user, args.api_key)
+    sources = find_pdfs(args.directory)
+    if not sources:
+        sys.exit(f"No PDF files found under '{args.directory}'.")
+    print(f"Ingesting {len(sources)} PDFs for '{args.user}' with {args.workers} workers...", file=sys.stderr)
+
+    def progress(done, total, filename):
+        print(f"[{done}/{total}] {filename}", file=sys.stderr)
+
+    result = get_engine().ingest(sources, args.user, api_key, workers=args.workers, progress=progress)
+    for filename, reason in result.skipped:
+        print(f"SKIPPED {filename}: {reason}", file=sys.stderr)
+    for filename, message in result.errors:
+        print(f"ERROR {filename}: {message}", file=sys.stderr)
+    if args.verbose:
+        for entry in result.logs:
+            print(entry, file=sys.stderr)
+
+    print(json.dumps({
+        "username": result.username,
+        "success": result.success,
+        "added": len(result.added),
+        "skipped": len(result.skipped),
+        "errors": len(result.errors),
+        "chunk_count": result.chunk_count,
+        "version": result.version,
+        "error": result.error,
+        "timings": result.timings,
+    }))
+    return 0 if result.success else 1
+
+async def answer_all(questions, username, api_key, concurrency, output):
+    """Answers questions concurrently, writing one JSON line per answer as each finishes."""
+    engine = get_engine()
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    # Load the store once up front rather than in every concurrent first query.
+    # A failure here is reported per question by aquery below.
+    try:
+        await asyncio.to_thread(engine.get_index, username, api_key)
+    except Exception:
+        pass
+
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def answer(record):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            result = await engine.aquery(record["question"], username, api_key)
+            latency = time.perf_counter() - start
+        if not result.ok:
+            failures += 1
+        output.write(json.dumps({
+            "id": record["id"],
+            "question": result.question,
+            "answer": result.answer,
+            "sources": result.sources,
+            "scores": result.scores,
+            "gated": result.gated,
+            "latency_s": round(latency, 4),
+            "timings": result.timings,
+            "error": result.error,
+        }, ensure_ascii=False) + "\n")
+        output.flush()
+
+    await asyncio.gather(*(answer(record) for record in questions))
+    return failures
+
+def cmd_ask(args):
+    api_key = resolve_api_key(args.user, args.api_key)
+    questions = read_questions(args.questions)
+    print(f"Answering {len(questions)} questions for '{args.user}' (concurrency {args.concurrency})...", file=sys.stderr)
+
+    start = time.perf_counter()
+    if args.output == "-":
+        failures = asyncio.run(answer_all(questions, args.user, api_key, args.concurrency, sys.stdout))
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            failures = asyncio.run(answer_all(questions, args.user, api_key, args.concurrency, output))
+    elapsed = time.perf_counter() - start
+    print(f"Done in {elapsed:.1f}s; {failures} failed.", file=sys.stderr)
+    return 0 if not failures else 1
+
+def cmd_gate_stats(args):
+    decisions = get_gate_decisions(args.user, args.limit)
+    max_scores = [row[3] for row in decisions if row[3] is not None]
+    if not decisions:
+        print("No relevance gate decisions recorded yet.")
+        return 0
+    passed = sum(row[4] for row in decisions)
+    print(f"{len(decisions)} decisions, {passed} passed ({passed / len(decisions):.1%}) "
+          f"at the recorded thresholds; {len(decisions) - len(max_scores)} had no retrieved chunks.")
+
+    # Distribution of the best chunk score per question
+    print("\nBest-chunk score distribution:")
+    bin_width = 0.05
+    bins = {}
+    for score in max_scores:
+        low = int(score // bin_width) * bin_width
+        bins[low] = bins.get(low, 0) + 1
+    largest = max(bins.values()) if bins else 1
+    for low in sorted(bins):
+        bar = "#" * max(1, round(40 * bins[low] / largest))
+        print(f"  {low:5.2f}-{low + bin_width:4.2f} {bins[low]:>6}  {bar}")
+
+    # What each candidate threshold would have done to the same questions
+    print("\nThreshold   would skip LLM")
+    for threshold in args.thresholds:
+        blocked = len(decisions) - sum(1 for score in max_scores if score >= threshold)
+        marker = "  (current)" if threshold == RELEVANCE_THRESHOLD else ""
+        print(f"  {threshold:6.2f}   {blocked:>6} ({blocked / len(decisions):.1%}){marker}")
+    return 0
+
+def cmd_reindex(args):
+    usernames = [args.user] if args.user else get_usernames_with_pdfs()
+    if not usernames:
+        print("No users with stored PDFs.", file=sys.stderr)
+        return 0
+    failures = 0
+    for username in usernames:
+        status = "resplit (forced)" if args.force else index_status(store.load_manifest(username))
+        if args.dry_run or status == CURRENT:
+            print(json.dumps({"username": username, "status": status, "rebuilt": False}))
+            continue
+        # Each user is rebuilt with their own stored key unless one is given explicitly
+        api_key = args.api_key or get_user(username) or os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            print(f"ERROR {username}: no API key stored; skipped.", file=sys.stderr)
+            failures += 1
+            continue
+        result = get_engine().reindex(username, api_key, force=args.force)
+        if args.verbose:
+            for entry in result.logs:
+                print(entry, file=sys.stderr)
+        if not result.success:
+            failures += 1
+        print(json.dumps({
+            "username": username,
+            "status": result.index_status,
+            "rebuilt": result.success,
+            "chunk_count": result.chunk_count,
+            "embedded_count": result.embedded_count,
+            "version": result.version,
+            "error": result.error,
+            "timings": result.timings,
+        }))
+    return 0 if not failures else 1
+
+def open_snapshot_store(args):
+    snapshot_store = snapshots.get_snapshot_store(args.snapshot_store or "local", args.snapshot_path)
+    print(f"Using '{snapshot_store.name}' snapshot store at '{args.snapshot_path}'.", file=sys.stderr)
+    return snapshot_store
+
+def cmd_publish_snapshots(args):
+    snapshot_store = open_snapshot_store(args)
+    usernames = [args.user] if args.user else get_usernames_with_pdfs()
+    failures = 0
+    for username in usernames:
+        try:
+            manifest = snapshots.publish_snapshot(snapshot_store, username)
+        except Exception as e:
+            print(f"ERROR {username}: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        print(json.dumps({key: manifest.get(key) for key in ("username", "version", "chunk_count", "size", "sha256")}))
+    return 0 if not failures else 1
+
+def cmd_sync_snapshots(args):
+    # Syncing through the engine keeps its cache and the chunk browser table in step
+    engine = get_engine()
+    engine.snapshot_store = open_snapshot_store(args)
+    while True:
+        usernames = [args.user] if args.user else engine.snapshot_store.usernames()
+        failures = 0
+        for username in usernames:
+            try:
+                status = engine.sync(username)
+            except Exception as e:
+                print(f"ERROR {username}: {e}", file=sys.stderr)
+                failures += 1
+                continue
+            if status != snapshots.SYNC_CURRENT or not args.watch:
+                print(json.dumps({"username": username, "status": status, "version": store.current_version(username)}))
+                sys.stdout.flush()
+        if not args.watch:
+            return 0 if not failures else 1
+        time.sleep(args.watch)
+
+def cmd_rollback(args):
+    if not args.version:
+        live = store.current_version(args.user)
+        for version in store.list_versions(args.user):
+            print(f"{version}{'  (live)' if version == live else ''}")
+        return 0
+    try:
+        get_engine().rollback(args.user, args.version)
+    except Exception as e:
+        print(f"ERROR {args.user}: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps({"username": args.user, "version": store.current_version(args.user)}))
+    return 0
+
+def cmd_serve(args):
+    server = make_server(args.host, args.port)
+    print(f"Serving the engine on http://{args.host}:{server.server_port} (set ENGINE_URL in config.py to use it)",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+# --- Argument Parsing ---
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+def float_list(value):
+    return [float(part) for part in value.split(",") if part.strip()]
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bulk ingest and batch question answering for Chat with PDFs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Ingest every PDF under a directory tree for a user.")
+    ingest.add_argument("directory", help="Directory to scan recursively for .pdf files.")
+    ingest.add_argument("--user", required=True, help="Username that will own the documents.")
+    ingest.add_argument("--api-key", help="Google API key (defaults to GOOGLE_API_KEY or the stored key).")
+    ingest.add_argument("--workers", type=positive_int, default=os.cpu_count() or 1, help="Parallel text extraction processes.")
+    ingest.add_argument("-v", "--verbose", action="store_true", help="Print the engine's debug logs.")
+    ingest.set_defaults(func=cmd_ingest)
+
+    ask = subparsers.add_parser("ask", help="Answer questions from a JSONL file.")
+    ask.add_argument("--user", required=True, help="Username whose documents are searched.")
+    ask.add_argument("--api-key", help="Google API key (defaults to GOOGLE_API_KEY or the stored key).")
+    ask.add_argument("--questions", required=True, help='JSONL input, one {"question": ..., "id": ...} per line.')
+    ask.add_argument("--output", default="-", help="JSONL output path ('-' for stdout).")
+    ask.add_argument("--concurrency", type=positive_int, default=8, help="Maximum questions in flight at once.")
+    ask.set_defaults(func=cmd_ask)
+
+    gate_stats = subparsers.add_parser("gate-stats", help="Summarize relevance gate decisions for threshold tuning.")
+    gate_stats.add_argument("--user", help="Only include this user's questions.")
+    gate_stats.add_argument("--limit", type=positive_int, help="Only include the most recent N decisions.")
+    gate_stats.add_argument("--thresholds", type=float_list, default=[0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6],
+                            help="Comma-separated thresholds to evaluate.")
+    gate_stats.set_defaults(func=cmd_gate_stats)
+
+    reindex = subparsers.add_parser("reindex", help="Rebuild indexes whose chunk or embedding settings are out of date.")
+    reindex.add_argument("--user", help="Only check this user (default: every user with PDFs).")
+    reindex.add_argument("--api-key", help="Google API key (defaults to each user's stored key, then GOOGLE_API_KEY).")
+    reindex.add_argument("--dry-run", action="store_true", help="Only report what each index needs.")
+    reindex.add_argument("--force", action="store_true", help="Re-split and rebuild even indexes that are current.")
+    reindex.add_argument("-v", "--verbose", action="store_true", help="Print the engine's debug logs.")
+    reindex.set_defaults(func=cmd_reindex)
+
+
+    publish = subparsers.add_parser("publish-snapshots", help="Publish users' live indexes to the snapshot store.")
+    publish.add_argument("--user", help="Only publish this user (default: every user with PDFs).")
+    publish.add_argument("--snapshot-store", default=SNAPSHOT_STORE, help="Snapshot store backend (default: config, else 'local').")
+    publish.add_argument("--snapshot-path", default=SNAPSHOT_STORE_PATH, help="Snapshot store location.")
+    publish.set_defaults(func=cmd_publish_snapshots)
+
+    sync = subparsers.add_parser("sync-snapshots", help="Pull the newest published index snapshots and make them live.")
+    sync.add_argument("--user", help="Only sync this user (default: every user in the snapshot store).")
+    sync.add_argument("--snapshot-store", default=SNAPSHOT_STORE, help="Snapshot store backend (default: config, else 'local').")
+    sync.add_argument("--snapshot-path", default=SNAPSHOT_STORE_PATH, help="Snapshot store location.")
+    sync.add_argument("--watch", type=positive_int, help="Keep syncing every N seconds.")
+    sync.set_defaults(func=cmd_sync_snapshots)
+
+    rollback = subparsers.add_parser("rollback", help="Make an earlier local index version live again.")
+    rollback.add_argument("--user", required=True, help="User whose index to roll back.")
+    rollback.add_argument("--version", help="Version to make live (default: list the versions on disk).")
+    rollback.set_defaults(func=cmd_rollback)
+
+    serve = subparsers.add_parser("serve", help="Serve one shared engine over HTTP for app processes (see ENGINE_URL).")
+    serve.add_argument("--host", default=ENGINE_HOST, help="Address to bind (default: config ENGINE_HOST).")
+    serve.add_argument("--port", type=int, default=ENGINE_PORT, help="Port to listen on (default: config ENGINE_PORT).")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    init_db()
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,11 @@ APP_ICON = ":books:"
 EMBEDDING_MODEL = "models/embedding-001"
 LLM_MODEL = "gemini-2.0-flash" # Or your preferred model
 TEMPERATURE = 0.3
+EMBED_BATCH_SIZE = 100 # Chunks per embeddings API call; each batch is cached before the next is sent
+
+# PDF Extraction Configuration
+PDF_EXTRACTION_BACKEND = "pypdf2" # "pypdf2" (default), or "pypdfium2" / "pdfminer" if installed
+PDF_PAGE_TIMEOUT = 30 # Seconds allowed per page before it is skipped; None disables the timeout
 
 # Text Splitting Configuration
 CHUNK_SIZE = 5000 # Smaller chunk size for more focused context
@@ -14,10 +19,43 @@ CHUNK_OVERLAP = 500 # Smaller overlap
 
 # Vector Store Configuration
 VECTOR_DB_PATH = "faiss_index"
+CHUNK_BROWSER_PAGE_SIZE = 10 # Chunks shown per page in the vector store browser
+INDEX_CACHE_MAX_USERS = 200 # Loaded user indexes kept in memory per process; least recently used are dropped first
+INDEX_CACHE_IDLE_TTL = 1800 # Seconds an unused loaded index is kept in memory
+INDEX_VERSIONS_KEPT = 2 # Index versions kept on disk per user (the live one and the one before it)
+
+# Index Snapshot Configuration (multi-replica serving)
+SNAPSHOT_STORE = None # "local" to publish built indexes as snapshots and pull them on replicas; None disables
+SNAPSHOT_STORE_PATH = "index_snapshots" # Where the snapshot store keeps archives (a directory for "local")
+SNAPSHOT_SYNC_INTERVAL = 30 # Seconds between checks for a newer snapshot per user; None only syncs via the CLI
+SNAPSHOT_SYNC_WORKERS = 2 # Background threads pulling snapshots, so questions never wait for a download
+SNAPSHOTS_KEPT = 5 # Snapshots kept per user in the snapshot store
+
+# Engine Service Configuration
+ENGINE_URL = None # e.g. "http://127.0.0.1:8765" to use the engine served by `python cli.py serve`; None runs it in-process
+ENGINE_HOST = "127.0.0.1" # Address `python cli.py serve` binds to by default (requests carry API keys: keep it private)
+ENGINE_PORT = 8765
+ENGINE_TIMEOUT = 600 # Seconds the app waits for an engine service response
+
+# Retrieval Configuration
+RETRIEVAL_K = 5 # Chunks passed to the LLM
+RETRIEVAL_FETCH_K = 20 # Candidates considered by MMR
+MMR_LAMBDA = 0.5 # 1.0 = pure relevance, 0.0 = maximum diversity
+HIERARCHICAL_RETRIEVAL = True # Pick the best documents first, then search only their chunks
+HIERARCHICAL_MIN_DOCUMENTS = 20 # Users with fewer PDFs than this use flat search
+DOC_TOP_K = 5 # Documents kept by the first stage
+
+# Relevance Gate Configuration
+RELEVANCE_GATE_ENABLED = False # Skip the LLM when no retrieved chunk is relevant enough. Off (shadow mode: decisions
+                               # are only logged) until `python cli.py gate-stats` on real traffic supports a threshold
+RELEVANCE_THRESHOLD = 0.45 # Minimum cosine similarity of the best chunk; untuned starting point for gate-stats
 
 # Database Configuration
 DB_NAME = "user_data.db"
 
+# Chat History Configuration
+CHAT_HISTORY_PAGE_SIZE = 20 # Messages rendered per page; older pages load on demand
+
 # Avatar URLs
 USER_AVATAR = "https://i.ibb.co/CKpTnWr/user-icon-2048x2048-ihoxz4vq.png"
 BOT_AVATAR = "https://i.ibb.co/wNmYHsx/langchain-logo.webp"
@@ -26,3 +64,6 @@ BOT_AVATAR = "https://i.ibb.co/wNmYHsx/langchain-logo.webp"
 LINKEDIN_URL = "https://www.linkedin.com/in/prateek1022/"
 GITHUB_URL = "https://github.com/prateek1022"
 API_KEY_URL = "https://ai.google.dev/" # URL for getting API key
+
+# Client Pool Configuration
+CLIENT_POOL_IDLE_TTL = 900 # Seconds an unused LLM/embedding client is kept before eviction
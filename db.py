@@ -0,0 +1,414 @@
+import json
+import sqlite3
+import os # Needed for directory check
+from datetime import datetime
+from config import DB_NAME, VECTOR_DB_PATH # Import constants
+
+# --- Database Functions ---
+# Plain SQLite helpers with no Streamlit dependency, shared by the UI (auth.py)
+# and the headless engine package.
+
+def init_db():
+    """Initialize the SQLite database and create tables if they don't exist."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            api_key TEXT
+        )
+    ''')
+    # User PDFs table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_pdfs (
+            pdf_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            extracted_text TEXT,
+            FOREIGN KEY (username) REFERENCES users (username)
+        )
+    ''')
+    # Index to potentially speed up lookups
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_pdfs_username ON user_pdfs (username)
+    ''')
+    # Chat history table (persists conversations across logins)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_history (
+            message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            model TEXT,
+            created_at TEXT NOT NULL,
+            pdf_names TEXT,
+            FOREIGN KEY (username) REFERENCES users (username)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_chat_history_username ON chat_history (username, message_id)
+    ''')
+    # Vector store chunks: text and metadata of every chunk in a user's live index,
+    # tagged with the splitter fingerprint and embedding model that produced them
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vector_chunks (
+            chunk_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            source TEXT NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            content_hash TEXT,
+            splitter_fingerprint TEXT,
+            embedding_model TEXT,
+            FOREIGN KEY (username) REFERENCES users (username)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vector_chunks_username ON vector_chunks (username, source, chunk_index)
+    ''')
+    # Embedding cache by chunk text hash. Written batch by batch while embedding, so an
+    # interrupted build keeps what it already paid for, and independent of vector_chunks
+    # so replacing the chunk rows never discards embeddings.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chunk_embeddings (
+            username TEXT NOT NULL,
+            embedding_model TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            PRIMARY KEY (username, embedding_model, content_hash)
+        )
+    ''')
+    # Relevance gate decisions, kept for tuning RELEVANCE_THRESHOLD
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS relevance_gate_log (
+            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            question TEXT,
+            created_at TEXT NOT NULL,
+            threshold REAL NOT NULL,
+            max_score REAL,
+            passed INTEGER NOT NULL,
+            enforced INTEGER NOT NULL,
+            scores TEXT
+        )
+    ''')
+    conn.commit()
+    conn.close()
+    # Ensure base vector store directory exists
+    if not os.path.exists(VECTOR_DB_PATH):
+        os.makedirs(VECTOR_DB_PATH)
+
+
+def get_user(username):
+    """Retrieve user's API key from the database."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("SELECT api_key FROM users WHERE username = ?", (username,))
+    result = cursor.fetchone()
+    conn.close()
+    return result[0] if result else None
+
+def has_user(username):
+    """Returns True if a user record exists (even if its API key is NULL)."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM users WHERE username = ?", (username,))
+    result = cursor.fetchone()
+    conn.close()
+    return result is not None
+
+def add_user(username):
+    """Add a new user to the database with a null API key."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO users (username, api_key) VALUES (?, NULL)", (username,))
+        conn.commit()
+        return True
+    except sqlite3.IntegrityError:
+        return False
+    finally:
+        conn.close()
+
+def update_api_key(username, api_key):
+    """Update the API key for a given user."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET api_key = ? WHERE username = ?", (api_key, username))
+    conn.commit()
+    conn.close()
+
+# --- PDF Data Functions ---
+
+def add_pdf_record(username, filename, extracted_text):
+    """Adds a record for an uploaded PDF, avoiding duplicates by filename for the user.
+       Returns "added" or "exists"; database errors are raised to the caller.
+    """
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    try:
+        # Check if this filename already exists for this user
+        cursor.execute("SELECT 1 FROM user_pdfs WHERE username = ? AND filename = ?", (username, filename))
+        if cursor.fetchone():
+            return "exists"
+        cursor.execute(
+            "INSERT INTO user_pdfs (username, filename, extracted_text, uploaded_at) VALUES (?, ?, ?, ?)",
+            (username, filename, extracted_text, datetime.now())
+        )
+        conn.commit()
+        return "added"
+    finally:
+        conn.close()
+
+
+def get_user_pdf_texts(username):
+    """Retrieves a list of all extracted texts for a given user's PDFs."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("SELECT extracted_text FROM user_pdfs WHERE username = ?", (username,))
+    results = cursor.fetchall()
+    conn.close()
+    # Return a list of non-empty text strings
+    return [row[0] for row in results if row[0]]
+
+def get_user_pdf_filenames(username):
+    """Retrieves a list of filenames for a given user's PDFs."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("SELECT filename FROM user_pdfs WHERE username = ? ORDER BY uploaded_at DESC", (username,))
+    results = cursor.fetchall()
+    conn.close()
+    return [row[0] for row in results]
+
+def get_user_pdf_data(username):
+    """Retrieves a list of (filename, extracted_text) tuples for a given user's PDFs."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("SELECT filename, extracted_text FROM user_pdfs WHERE username = ?", (username,))
+    results = cursor.fetchall()
+    conn.close()
+    # Return list of tuples, ensuring text is not None (though DB likely handles this)
+    return [(row[0], row[1]) for row in results if row[1]]
+
+# --- Chat History Functions ---
+# Rows are returned as (question, answer, model, created_at, pdf_names) tuples,
+# the same shape the UI and CSV export have always used.
+
+def add_chat_message(username, question, answer, model, pdf_names):
+    """Stores one question/answer pair for the user."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO chat_history (username, question, answer, model, created_at, pdf_names) VALUES (?, ?, ?, ?, ?, ?)",
+        (username, question, answer, model, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), pdf_names)
+    )
+    conn.commit()
+    conn.close()
+
+def get_recent_chat_messages(username, limit):
+    """Retrieves the user's most recent `limit` messages, oldest first."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT question, answer, model, created_at, pdf_names FROM chat_history "
+        "WHERE username = ? ORDER BY message_id DESC LIMIT ?",
+        (username, limit)
+    )
+    results = cursor.fetchall()
+    conn.close()
+    return results[::-1]
+
+def count_chat_messages(username):
+    """Returns how many messages are stored for the user."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM chat_history WHERE username = ?", (username,))
+    result = cursor.fetchone()
+    conn.close()
+    return result[0]
+
+def iter_chat_messages(username, batch_size=500):
+    """Yields all of the user's messages oldest first, fetching batch_size rows at a time."""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT question, answer, model, created_at, pdf_names FROM chat_history "
+            "WHERE username = ? ORDER BY message_id",
+            (username,)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def clear_chat_history(username):
+    """Deletes every stored message for the user."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM chat_history WHERE username = ?", (username,))
+    conn.commit()
+    conn.close()
+
+# --- Vector Chunk Functions ---
+
+def replace_user_chunks(username, chunks, splitter_fingerprint=None, embedding_model=None):
+    """Replaces the user's stored chunks with [(source, chunk_index, content, content_hash), ...]
+       in one transaction. Cached embeddings in chunk_embeddings are left alone.
+    """
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        with conn:
+            conn.execute("DELETE FROM vector_chunks WHERE username = ?", (username,))
+            conn.executemany(
+                "INSERT INTO vector_chunks (username, source, chunk_index, content, content_hash, "
+                "splitter_fingerprint, embedding_model) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(username, source, chunk_index, content, content_hash, splitter_fingerprint, embedding_model)
+                 for source, chunk_index, content, content_hash in chunks]
+            )
+    finally:
+        conn.close()
+
+def get_user_chunks(username):
+    """Retrieves every (source, chunk_index, content) chunk of the user's index in order."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT source, chunk_index, content FROM vector_chunks WHERE username = ? ORDER BY chunk_id",
+        (username,)
+    )
+    results = cursor.fetchall()
+    conn.close()
+    return results
+
+def add_chunk_embeddings(username, embedding_model, embeddings):
+    """Caches [(content_hash, embedding bytes), ...] for the user in one transaction."""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings (username, embedding_model, content_hash, embedding) "
+                "VALUES (?, ?, ?, ?)",
+                [(username, embedding_model, content_hash, embedding) for content_hash, embedding in embeddings]
+            )
+    finally:
+        conn.close()
+
+def get_chunk_embeddings(username, embedding_model):
+    """Returns {content_hash: embedding bytes} of the user's cached embeddings from embedding_model."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT content_hash, embedding FROM chunk_embeddings WHERE username = ? AND embedding_model = ?",
+        (username, embedding_model)
+    )
+    results = cursor.fetchall()
+    conn.close()
+    return {content_hash: embedding for content_hash, embedding in results}
+
+def prune_chunk_embeddings(username, embedding_model):
+    """Drops the user's cached embeddings that no stored chunk uses with embedding_model."""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        with conn:
+            conn.execute(
+                "DELETE FROM chunk_embeddings WHERE username = ? AND (embedding_model != ? OR content_hash NOT IN "
+                "(SELECT content_hash FROM vector_chunks WHERE username = ? AND content_hash IS NOT NULL))",
+                (username, embedding_model, username)
+            )
+    finally:
+        conn.close()
+
+def get_usernames_with_pdfs():
+    """Retrieves every username that has at least one stored PDF."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT username FROM user_pdfs ORDER BY username")
+    results = cursor.fetchall()
+    conn.close()
+    return [row[0] for row in results]
+
+def _chunk_filter(username, source, search):
+    """Builds the WHERE clause and parameters shared by the chunk browsing queries."""
+    clause = "username = ?"
+    params = [username]
+    if source:
+        clause += " AND source = ?"
+        params.append(source)
+    if search:
+        # Escape LIKE wildcards so the search is a plain substring match
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        clause += " AND content LIKE ? ESCAPE '\\'"
+        params.append(f"%{escaped}%")
+    return clause, params
+
+def count_chunks(username, source=None, search=None):
+    """Counts the user's chunks matching the optional source and text filters."""
+    clause, params = _chunk_filter(username, source, search)
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM vector_chunks WHERE {clause}", params)
+    result = cursor.fetchone()
+    conn.close()
+    return result[0]
+
+def get_chunk_page(username, limit, offset, source=None, search=None):
+    """Retrieves one page of (source, chunk_index, content) rows ordered by source and position."""
+    clause, params = _chunk_filter(username, source, search)
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT source, chunk_index, content FROM vector_chunks WHERE {clause} "
+        "ORDER BY source, chunk_index LIMIT ? OFFSET ?",
+        params + [limit, offset]
+    )
+    results = cursor.fetchall()
+    conn.close()
+    return results
+
+def get_chunk_sources(username):
+    """Retrieves the distinct source filenames among the user's chunks."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT source FROM vector_chunks WHERE username = ? ORDER BY source", (username,))
+    results = cursor.fetchall()
+    conn.close()
+    return [row[0] for row in results]
+
+# --- Relevance Gate Functions ---
+
+def add_gate_decision(username, question, threshold, scores, passed, enforced):
+    """Stores one relevance gate decision with the retrieval scores it was based on."""
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO relevance_gate_log (username, question, created_at, threshold, max_score, passed, enforced, scores) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (username, question, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), threshold,
+         max(scores) if scores else None, int(passed), int(enforced), json.dumps(scores))
+    )
+    conn.commit()
+    conn.close()
+
+def get_gate_decisions(username=None, limit=None):
+    """Retrieves (username, created_at, threshold, max_score, passed, enforced) rows, newest first."""
+    query = "SELECT username, created_at, threshold, max_score, passed, enforced FROM relevance_gate_log"
+    params = []
+    if username:
+        query += " WHERE username = ?"
+        params.append(username)
+    query += " ORDER BY log_id DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    results = cursor.fetchall()
+    conn.close()
+    return results
@@ -0,0 +1,6 @@
+"""Headless RAG engine: PDF ingest and question answering without Streamlit."""
+from engine.core import RAGEngine, AnswerStream, AsyncAnswerStream, get_engine
+from engine.results import IngestResult, QueryResult, ChunkPage
+from engine.clients import ClientPool, get_client_pool
+from engine.snapshots import SnapshotStore, LocalDirSnapshotStore, get_snapshot_store
+from engine.server import RemoteEngine, make_server
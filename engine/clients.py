@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import time
+
+from config import EMBEDDING_MODEL, LLM_MODEL, TEMPERATURE, CLIENT_POOL_IDLE_TTL
+from engine.prompts import QA_PROMPT_TEMPLATE
+
+# --- Client Pool ---
+
+class ClientPool:
+    """Process-wide cache of Google AI clients and compiled QA chains.
+
+    Clients are keyed by (kind, api_key, model, temperature) so every session using
+    the same key shares one client and therefore one long-lived connection channel
+    to the API. Entries unused for idle_ttl seconds are dropped on the next lookup,
+    which lets their connections close. Safe to use from many threads.
+    """
+
+    def __init__(self, idle_ttl=CLIENT_POOL_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> [client, last used timestamp]
+
+    @staticmethod
+    def _key(kind, api_key, *params):
+        # Hash the key so raw API keys never show up in reprs or debug dumps of the pool
+        key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        return (kind, key_hash) + params
+
+    def _get(self, key, factory):
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry:
+                entry[1] = now
+                return entry[0]
+        # Build outside the lock; if two threads race, the first one stored wins
+        client = factory()
+        with self._lock:
+            entry = self._entries.setdefault(key, [client, now])
+            return entry[0]
+
+    def _evict_idle(self, now):
+        expired = [key for key, (_, last_used) in self._entries.items() if now - last_used > self.idle_ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def evict_idle(self):
+        """Drops every entry that has been idle for longer than idle_ttl."""
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    # --- Factories ---
+
+    # LangChain modules are imported inside the factories so importing the engine stays cheap
+
+    def embeddings(self, api_key, model=EMBEDDING_MODEL):
+        """Shared GoogleGenerativeAIEmbeddings client."""
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return self._get(
+            self._key("embeddings", api_key, model),
+            lambda: GoogleGenerativeAIEmbeddings(model=model, google_api_key=api_key)
+        )
+
+    def chat_model(self, api_key, model=LLM_MODEL, temperature=TEMPERATURE):
+        """Shared ChatGoogleGenerativeAI client."""
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return self._get(
+            self._key("chat", api_key, model, temperature),
+            lambda: ChatGoogleGenerativeAI(model=model, temperature=temperature, google_api_key=api_key)
+        )
+
+    def qa_chain(self, api_key, model=LLM_MODEL, temperature=TEMPERATURE):
+        """Shared "stuff" QA chain built on the pooled chat model."""
+        def build():
+            from langchain.chains.question_answering import load_qa_chain
+            from langchain.prompts import PromptTemplate
+            prompt = PromptTemplate(template=QA_PROMPT_TEMPLATE, input_variables=["context", "question"])
+            return load_qa_chain(self.chat_model(api_key, model, temperature), chain_type="stuff", prompt=prompt)
+        return self._get(self._key("qa_chain", api_key, model, temperature), build)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_client_pool():
+    """Returns the process-wide ClientPool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClientPool()
+        return _pool
@@ -0,0 +1,679 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from config import (
+    LLM_MODEL, EMBEDDING_MODEL, EMBED_BATCH_SIZE, RETRIEVAL_K, RETRIEVAL_FETCH_K, MMR_LAMBDA,
+    HIERARCHICAL_RETRIEVAL, HIERARCHICAL_MIN_DOCUMENTS, DOC_TOP_K, SNAPSHOT_SYNC_INTERVAL, SNAPSHOT_SYNC_WORKERS,
+    INDEX_CACHE_MAX_USERS, INDEX_CACHE_IDLE_TTL, PDF_PAGE_TIMEOUT
+)
+from db import (
+    add_pdf_record, get_user_pdf_data,
+    replace_user_chunks, get_user_chunks, add_chunk_embeddings, get_chunk_embeddings, prune_chunk_embeddings,
+    count_chunks, get_chunk_page, get_chunk_sources
+)
+from engine.clients import get_client_pool
+from engine.extractors import extract_text, process_context
+from engine.fingerprint import (
+    CURRENT, RESPLIT, content_hash, embedding_fingerprint, index_status, splitter_fingerprint, splitter_settings
+)
+from engine.gate import RelevanceGate
+from engine.prompts import QA_PROMPT_TEMPLATE, NOT_AVAILABLE_ANSWER
+from engine.results import IngestResult, QueryResult, ChunkPage, timed
+from engine import snapshots, store
+
+# --- Helpers ---
+
+def _source_name(source):
+    """Display filename for an upload object, a path, or a (filename, file) tuple."""
+    if isinstance(source, tuple):
+        return source[0]
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    return source.name
+
+def _source_file(source):
+    """The readable part of a source: a path or a file-like object."""
+    return source[1] if isinstance(source, tuple) else source
+
+def extract_pdf_text(source):
+    """Extracts text from one PDF with the configured backend.
+       Returns (text, skipped_pages); errors opening the file are raised to the caller.
+    """
+    return extract_text(_source_file(source))
+
+def _format_docs_log(title, user_question, docs, footer):
+    """Builds the debug log block listing retrieved documents with their metadata."""
+    log_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    entry = f"[{log_timestamp}] {title}:\nUser Question: {user_question}\n\n"
+    for i, doc in enumerate(docs):
+        metadata_str = ", ".join([f"{k}: {v}" for k, v in doc.metadata.items()])
+        entry += f"\n--- Document {i+1} (Metadata: {metadata_str}) ---\n{doc.page_content}\n--- End Document {i+1} ---\n"
+    return entry + f"\n--- {footer} ---"
+
+
+class AnswerStream:
+    """Iterable of answer text chunks; `result` is complete once iteration finishes."""
+
+    def __init__(self, result, chunks):
+        self.result = result
+        self._chunks = chunks
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+
+class AsyncAnswerStream:
+    """Async counterpart of AnswerStream."""
+
+    def __init__(self, result, chunks):
+        self.result = result
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._chunks.__aiter__()
+
+
+# --- Engine ---
+
+class RAGEngine:
+    """UI-independent ingest and question-answering over per-user FAISS stores.
+
+    One instance is meant to be shared by every session in a process so loaded
+    vector stores stay warm between questions. All methods are thread-safe.
+    """
+
+    def __init__(self, retrieval_k=RETRIEVAL_K, retrieval_fetch_k=RETRIEVAL_FETCH_K, mmr_lambda=MMR_LAMBDA,
+                 hierarchical=HIERARCHICAL_RETRIEVAL, hierarchical_min_documents=HIERARCHICAL_MIN_DOCUMENTS,
+                 doc_top_k=DOC_TOP_K, clients=None, gate=None, snapshot_store=None,
+                 sync_interval=SNAPSHOT_SYNC_INTERVAL, cache_max_users=INDEX_CACHE_MAX_USERS,
+                 cache_idle_ttl=INDEX_CACHE_IDLE_TTL, embed_batch_size=EMBED_BATCH_SIZE):
+        self.clients = clients or get_client_pool()
+        self.gate = gate or RelevanceGate()
+        self.snapshot_store = snapshot_store  # SnapshotStore to publish builds to and pull them from, or None
+        self.sync_interval = sync_interval
+        self.cache_max_users = cache_max_users
+        self.cache_idle_ttl = cache_idle_ttl
+        self.embed_batch_size = embed_batch_size
+        self.retrieval_k = retrieval_k
+        self.retrieval_fetch_k = retrieval_fetch_k
+        self.mmr_lambda = mmr_lambda
+        self.hierarchical = hierarchical
+        self.hierarchical_min_documents = hierarchical_min_documents
+        self.doc_top_k = doc_top_k
+        self._lock = threading.Lock()
+        self._stores = OrderedDict()  # username -> [index version, UserIndex, last used], least recently used first
+        self._last_sync = {}   # username -> time.monotonic() of the last snapshot check
+        self._sync_pool = ThreadPoolExecutor(max_workers=SNAPSHOT_SYNC_WORKERS, thread_name_prefix="snapshot-sync")
+        self._syncing = set()  # usernames with a background sync queued or running
+        self._sync_logs = {}   # username -> messages from background syncs, reported with the next question
+        self._user_locks = {}  # username -> lock serialising rebuilds of that user's store
+
+    def _user_lock(self, username):
+        with self._lock:
+            return self._user_locks.setdefault(username, threading.Lock())
+
+    # --- Vector store cache ---
+
+    def get_index(self, username, api_key):
+        """Returns the user's UserIndex, reusing the cached copy while the live version is unchanged.
+
+        When a new version goes live (a rebuild here, in another process, or a pulled
+        snapshot) the next call loads it; queries already holding the old UserIndex
+        finish with it. At most cache_max_users indexes stay loaded, and any unused
+        for cache_idle_ttl seconds are dropped.
+        """
+        current = store.current_index(username)
+        if current is None:
+            return None
+        version, index_path = current
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            cached = self._stores.get(username)
+            if cached and cached[0] == version:
+                cached[2] = now
+                self._stores.move_to_end(username)
+                return cached[1]
+        user_index = store.load_user_index(index_path, self.clients.embeddings(api_key))
+        if user_index is not None:
+            with self._lock:
+                self._stores[username] = [version, user_index, now]
+                self._stores.move_to_end(username)
+                while len(self._stores) > self.cache_max_users:
+                    self._stores.popitem(last=False)
+        return user_index
+
+    def _evict_idle(self, now):
+        expired = [username for username, (_, _, last_used) in self._stores.items()
+                   if now - last_used > self.cache_idle_ttl]
+        for username in expired:
+            del self._stores[username]
+
+    def evict_idle(self):
+        """Drops every loaded index that has been unused for longer than cache_idle_ttl."""
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    # --- Snapshots ---
+
+    def sync(self, username):
+        """Pulls the user's newest published snapshot if it is newer than the live local index.
+           Returns SYNC_CURRENT, SYNC_UPDATED or SYNC_MISSING; errors are raised to the caller.
+        """
+        if not self.snapshot_store:
+            raise ValueError("No snapshot store is configured (set SNAPSHOT_STORE in config.py).")
+        with self._user_lock(username):
+            return self._pull_snapshot(username)
+
+    def _pull_snapshot(self, username):
+        """sync() for callers already holding the user's lock."""
+        status = snapshots.sync_snapshot(self.snapshot_store, username)
+        if status == snapshots.SYNC_UPDATED:
+            self._import_live_chunks(username)
+        return status
+
+    def rollback(self, username, version):
+        """Makes an earlier index version that is still on disk live again.
+           Only this process's disk is affected: replicas keep following the snapshot store.
+        """
+        with self._user_lock(username):
+            store.activate_version(username, version)
+            self._import_live_chunks(username)
+
+    def _import_live_chunks(self, username):
+        """Refreshes the user's chunk rows from the live index and caches its vectors as
+           embeddings, so a later rebuild here reuses them instead of re-embedding.
+        """
+        manifest = store.load_manifest(username) or {}
+        chunks = [
+            (chunk_source, chunk_index, content, content_hash(content))
+            for chunk_source, chunk_index, content in store.read_docstore_chunks(username)
+        ]
+        replace_user_chunks(username, chunks, manifest.get("splitter_fingerprint"), manifest.get("embedding_model"))
+        if manifest.get("embedding_model"):
+            vectors = store.read_index_vectors(username)
+            add_chunk_embeddings(username, manifest["embedding_model"], [
+                (chunk[3], vector.astype("float32").tobytes()) for chunk, vector in zip(chunks, vectors)
+            ])
+
+    def _build_sequence(self, username, result):
+        """Build sequence for the next version: one more than both the live local index and
+           the newest published snapshot, so the new build sorts after either of them.
+        """
+        sequences = [(store.load_manifest(username) or {}).get("build_sequence", 0)]
+        if self.snapshot_store:
+            try:
+                sequences.append((self.snapshot_store.latest(username) or {}).get("build_sequence", 0))
+            except Exception as e:
+                result.logs.append(f"WARNING: could not read the latest snapshot's build sequence: {e}")
+        return max(sequences) + 1
+
+    def _covers_latest_snapshot(self, username, sources, result):
+        """False (after logging why) if the newest published snapshot has documents that
+           a build over `sources` would drop, e.g. PDFs uploaded on another replica.
+        """
+        latest = self.snapshot_store.latest(username) or {}
+        missing = sorted(set(latest.get("sources", [])) - set(sources))
+        if missing:
+            result.logs.append(f"WARNING: index built but not published: snapshot {latest['version']} has "
+                               f"documents this build lacks: {', '.join(missing)}")
+            return False
+        return True
+
+    def _sync_if_due(self, username, result):
+        """Starts a background check for a newer snapshot at most every sync_interval seconds
+           per user. The question keeps using the live local index; once a pulled version
+           goes live, the next question loads it. Outcomes of earlier background syncs are
+           added to result.logs.
+        """
+        if not self.snapshot_store or self.sync_interval is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            result.logs.extend(self._sync_logs.pop(username, []))
+            if username in self._syncing or now - self._last_sync.get(username, float("-inf")) < self.sync_interval:
+                return
+            self._last_sync[username] = now
+            self._syncing.add(username)
+        self._sync_pool.submit(self._background_sync, username)
+
+    def _background_sync(self, username):
+        """Runs sync() on a sync pool thread and keeps its outcome for the user's next question."""
+        message = None
+        try:
+            # A rebuild of this user in progress will produce a newer version anyway
+            if not self._user_lock(username).locked() and self.sync(username) == snapshots.SYNC_UPDATED:
+                message = f"Pulled snapshot {store.current_version(username)} for '{username}'."
+        except Exception as e:
+            message = f"WARNING: snapshot sync failed, serving the local index: {e}"
+        with self._lock:
+            self._syncing.discard(username)
+            if message:
+                self._sync_logs.setdefault(username, []).append(message)
+
+    # --- Ingest ---
+
+    def extract(self, sources, result, workers=1):
+        """Yields (filename, text) for each PDF source as soon as its text is extracted,
+           recording problems on result. With workers > 1 up to `workers` files are parsed
+           at once and yielded in completion order. Without PDF_PAGE_TIMEOUT that takes a
+           process pool, so sources must then be paths or (filename, path) tuples rather
+           than open file objects.
+        """
+        if workers > 1:
+            if PDF_PAGE_TIMEOUT:
+                # Every document is already parsed in its own killable child process,
+                # so threads are enough to keep `workers` of them running
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract")
+            else:
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=process_context())
+            with pool:
+                futures = {pool.submit(extract_pdf_text, source): source for source in sources}
+                for future in as_completed(futures):
+                    outcome = self._extraction_outcome(futures[future], future.result, result)
+                    if outcome:
+                        yield outcome
+        else:
+            for source in sources:
+                outcome = self._extraction_outcome(source, lambda: extract_pdf_text(source), result)
+                if outcome:
+                    yield outcome
+
+    @staticmethod
+    def _extraction_outcome(source, get_text, result):
+        """Returns (filename, text) for one source, or None after recording why there is none."""
+        filename = _source_name(source)
+        try:
+            text, skipped_pages = get_text()
+        except Exception as e:
+            result.errors.append((filename, f"Error processing {filename}: {str(e)}"))
+            result.logs.append(f"TRACEBACK: {traceback.format_exc()}")
+            return None
+        for page_number, reason in skipped_pages:
+            result.logs.append(f"WARNING: '{filename}' page {page_number} skipped ({reason}).")
+        if not text.strip():
+            result.skipped.append((filename, f"No text could be extracted from '{filename}'."))
+            return None
+        return filename, text
+
+    def _embed_documents(self, username, docs, api_key, result):
+        """Returns (content hashes, vectors) for docs, embedding only text that has no cached
+           embedding from the current model. New embeddings are cached after every batch of
+           EMBED_BATCH_SIZE, so a failure part-way through keeps the batches already done.
+        """
+        import numpy as np
+        hashes = [content_hash(doc.page_content) for doc in docs]
+        cached = get_chunk_embeddings(username, EMBEDDING_MODEL)
+        to_embed = {}
+        for digest, doc in zip(hashes, docs):
+            if digest not in cached:
+                to_embed.setdefault(digest, doc.page_content)
+
+        result.logs.append(f"Embedding {len(to_embed)} new chunks; {len(docs) - len(to_embed)} reuse an existing embedding...")
+        pending = list(to_embed.items())
+        for start in range(0, len(pending), self.embed_batch_size):
+            batch = pending[start:start + self.embed_batch_size]
+            batch_vectors = self.clients.embeddings(api_key).embed_documents([text for _, text in batch])
+            new_embeddings = [(digest, np.asarray(vector, dtype=np.float32).tobytes())
+                              for (digest, _), vector in zip(batch, batch_vectors)]
+            add_chunk_embeddings(username, EMBEDDING_MODEL, new_embeddings)
+            cached.update(new_embeddings)
+            result.embedded_count += len(batch)
+            result.logs.append(f" -> Embedded {start + len(batch)}/{len(pending)} new chunks.")
+        vectors = [np.frombuffer(cached[digest], dtype=np.float32) for digest in hashes]
+        return hashes, vectors
+
+    def rebuild(self, username, api_key, result, resplit=True):
+        """Rebuilds the user's vector store.
+
+        With resplit=True the PDF texts stored in the DB are split again; otherwise the
+        chunks already stored for the user are reused as they are. Either way only chunk
+        text without an embedding from the current model is sent to the embeddings API.
+
+        With a snapshot store the newest published index is pulled first, and chunks of
+        documents whose PDF text isn't stored here (ingested on another replica) are
+        carried over from it, so the build doesn't drop them.
+        """
+        with self._user_lock(username):
+            if self.snapshot_store:
+                try:
+                    with timed(result.timings, "sync"):
+                        if self._pull_snapshot(username) == snapshots.SYNC_UPDATED:
+                            result.logs.append(f"Pulled snapshot {store.current_version(username)} before building.")
+                except Exception as e:
+                    result.logs.append(f"WARNING: could not pull the latest snapshot before building: {e}")
+
+            stored_chunks = get_user_chunks(username)
+            if stored_chunks and not resplit:
+                result.logs.append(f"Reusing {len(stored_chunks)} stored chunks (splitter settings unchanged)...")
+                docs = store.documents_from_chunks(stored_chunks)
+            else:
+                pdf_data = get_user_pdf_data(username)
+                local_sources = {filename for filename, _ in pdf_data}
+                carried_chunks = [chunk for chunk in stored_chunks if chunk[0] not in local_sources]
+                if not pdf_data and not carried_chunks:
+                    result.error = "No text content found for this user in the database."
+                    result.logs.append("WARNING: No text content found for user in DB.")
+                    return None
+                result.logs.append("Preparing documents for vector store...")
+                with timed(result.timings, "split"):
+                    docs = store.split_documents(pdf_data, result.logs)
+                if carried_chunks:
+                    carried_sources = sorted({chunk[0] for chunk in carried_chunks})
+                    result.logs.append(f"Keeping {len(carried_chunks)} existing chunks of {len(carried_sources)} documents "
+                                       f"whose PDF text isn't stored here: {', '.join(carried_sources)}")
+                    docs += store.documents_from_chunks(carried_chunks)
+            if not docs:
+                result.error = "No processable text content found in any PDF for vector store creation."
+                result.logs.append("WARNING: No processable documents generated.")
+                return None
+
+            with timed(result.timings, "embed"):
+                hashes, vectors = self._embed_documents(username, docs, api_key, result)
+                vector_store = store.build_vector_store(docs, vectors, self.clients.embeddings(api_key))
+            result.logs.append("Embedding complete.")
+
+            with timed(result.timings, "save"):
+                # Written to a staging directory and switched live in one step, so
+                # readers in this or another process never load a half-written index
+                version = store.new_version()
+                staging_path = store.stage_version(username, version)
+                try:
+                    sources = [doc.metadata["source"] for doc in docs]
+                    doc_count = store.save_document_index(staging_path, vectors, sources)
+                    store.save_vector_store(staging_path, vector_store)
+                    store.save_manifest(staging_path, {
+                        "username": username,
+                        "version": version,
+                        "build_sequence": self._build_sequence(username, result),
+                        "splitter_fingerprint": splitter_fingerprint(),
+                        "embedding_fingerprint": embedding_fingerprint(),
+                        "splitter": splitter_settings(),
+                        "embedding_model": EMBEDDING_MODEL,
+                        "chunk_count": len(docs),
+                        "document_count": doc_count,
+                        "sources": sorted(set(sources)),
+                        "built_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    })
+                    path = store.commit_version(username, version, staging_path)
+                except Exception:
+                    shutil.rmtree(staging_path, ignore_errors=True)
+                    raise
+                replace_user_chunks(username, [
+                    (doc.metadata["source"], doc.metadata["chunk_index"], doc.page_content, digest)
+                    for doc, digest in zip(docs, hashes)
+                ], splitter_fingerprint(), EMBEDDING_MODEL)
+                prune_chunk_embeddings(username, EMBEDDING_MODEL)
+            result.logs.append(f"Document index saved with {doc_count} documents.")
+            result.logs.append(f"Vector store version {version} saved to: {path}")
+            result.chunk_count = len(docs)
+            result.version = version
+
+            if self.snapshot_store:
+                try:
+                    if self._covers_latest_snapshot(username, sources, result):
+                        with timed(result.timings, "publish"):
+                            snapshots.publish_snapshot(self.snapshot_store, username, version)
+                        result.logs.append(f"Published snapshot {version}.")
+                except Exception as e:
+                    # The local index is live either way; replicas catch up on the next publish
+                    result.logs.append(f"WARNING: index built but not published to the snapshot store: {e}")
+        return vector_store
+
+    def reindex(self, username, api_key, force=False):
+        """Rebuilds the user's index only if its manifest doesn't match the current config.
+
+        Changed chunk settings re-split the stored PDF text; a changed embedding model
+        re-embeds the stored chunks without re-splitting. result.index_status records
+        which case applied.
+        """
+        result = IngestResult(username=username)
+        result.index_status = RESPLIT if force else index_status(store.load_manifest(username))
+        result.logs.append(f"Index status for '{username}': {result.index_status}")
+        if result.index_status == CURRENT:
+            result.success = True
+            return result
+        try:
+            with timed(result.timings, "total"):
+                vector_store = self.rebuild(username, api_key, result, resplit=result.index_status == RESPLIT)
+            result.success = vector_store is not None
+        except Exception as e:
+            result.error = f"Error rebuilding vector store: {str(e)}"
+            result.logs.append(f"ERROR: {result.error}")
+            result.logs.append(f"TRACEBACK: {traceback.format_exc()}")
+        return result
+
+    def ingest(self, sources, username, api_key, workers=1, progress=None):
+        """Extracts text from PDFs, stores it for the user, and rebuilds their vector store.
+           progress, if given, is called as progress(done, total, filename) after each file
+           with text is stored; files that fail or have no text are recorded on the result.
+        """
+        result = IngestResult(username=username)
+        if not sources:
+            result.error = "Please upload PDF files first."
+            return result
+        if not api_key:
+            result.error = "API Key is missing. Cannot process PDFs."
+            return result
+        if not username:
+            result.error = "Username missing. Cannot process PDFs."
+            return result
+
+        try:
+            with timed(result.timings, "total"):
+                # 1. Extract text and add each new file to the database as soon as it is done
+                with timed(result.timings, "extract"):
+                    done = 0
+                    for filename, text in self.extract(sources, result, workers):
+                        if add_pdf_record(username, filename, text) == "added":
+                            result.added.append(filename)
+                        else:
+                            result.skipped.append((filename, f"'{filename}' already exists in your records. Skipping."))
+                        done += 1
+                        if progress:
+                            progress(done, len(sources), filename)
+
+                # 2. Rebuild the vector store with all of the user's documents
+                result.success = self.rebuild(username, api_key, result) is not None
+        except Exception as e:
+            result.error = f"Error creating/saving vector store: {str(e)}"
+            result.logs.append(f"ERROR: {result.error}")
+            result.logs.append(f"TRACEBACK: {traceback.format_exc()}")
+            result.success = False
+        return result
+
+    # --- Query ---
+
+    def get_conversational_chain(self, api_key):
+        """Returns the pooled "stuff" QA chain for this API key."""
+        return self.clients.qa_chain(api_key)
+
+    def retrieve(self, user_question, username, api_key, result):
+        """Runs the (flat or two-stage) MMR search for a question; returns the documents or None on failure."""
+        if not api_key:
+            result.error = "API key is missing."
+            return None
+        if not username:
+            result.error = "Username missing. Cannot process question."
+            return None
+
+        self._sync_if_due(username, result)
+        with timed(result.timings, "load_store"):
+            user_index = self.get_index(username, api_key)
+        if not user_index:
+            result.error = "Vector store not found or failed to load. Please process/reprocess your PDFs."
+            return None
+
+        from engine import retrieval
+        with timed(result.timings, "embed_query"):
+            query_vector = self.clients.embeddings(api_key).embed_query(user_question)
+
+        if self.hierarchical and user_index.document_count >= self.hierarchical_min_documents:
+            # Stage one: keep the doc_top_k PDFs whose centroids are closest to the question
+            with timed(result.timings, "select_documents"):
+                doc_rows = retrieval.select_documents(query_vector, user_index.doc_centroids, self.doc_top_k)
+                selected_sources = [user_index.doc_sources[row] for row in doc_rows]
+                positions = user_index.positions_for(selected_sources)
+            result.logs.append(f"Two-stage retrieval: searching {len(positions)} chunks from "
+                               f"{len(selected_sources)} of {user_index.document_count} documents: {', '.join(selected_sources)}")
+        else:
+            # Flat search: the fetch_k nearest chunks across every document
+            with timed(result.timings, "select_documents"):
+                positions = user_index.nearest_positions(query_vector, self.retrieval_fetch_k)
+
+        # k = number of final docs, fetch_k = number of candidates considered by MMR
+        with timed(result.timings, "search_chunks"):
+            if positions:
+                picked, scores = retrieval.search_chunks(
+                    query_vector, user_index.chunk_vectors(positions),
+                    self.retrieval_k, self.retrieval_fetch_k, self.mmr_lambda
+                )
+                docs = user_index.documents([positions[i] for i in picked])
+            else:
+                docs, scores = [], []
+        result.documents = docs
+        result.scores = [round(float(score), 4) for score in scores]
+        result.sources = [
+            {"source": doc.metadata.get("source"), "chunk_index": doc.metadata.get("chunk_index")}
+            for doc in docs
+        ]
+        result.logs.append(_format_docs_log("VectorDB Search Results", user_question, docs, "End VectorDB Results"))
+        return docs
+
+    def _gate_passes(self, username, result):
+        """Applies the relevance gate; when it blocks, fills in the not-available answer."""
+        if self.gate.check(username, result):
+            return True
+        result.gated = True
+        result.answer = NOT_AVAILABLE_ANSWER
+        return False
+
+    def _fail(self, result, e):
+        result.error = f"Error processing question: {str(e)}"
+        log_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        result.logs.append(f"[{log_timestamp}] ERROR processing question: {str(e)}\nTRACEBACK: {traceback.format_exc()}")
+
+    def query(self, user_question, username, api_key):
+        """Answers a question from the user's documents and returns a QueryResult."""
+        result = QueryResult(question=user_question, model=LLM_MODEL)
+        try:
+            with timed(result.timings, "total"):
+                docs = self.retrieve(user_question, username, api_key, result)
+                if docs is None:
+                    return result
+                if not self._gate_passes(username, result):
+                    return result
+                chain = self.get_conversational_chain(api_key)
+                result.logs.append(_format_docs_log("LLM Query", user_question, docs, "End Context"))
+                with timed(result.timings, "generate"):
+                    response = chain.invoke({"input_documents": docs, "question": user_question})
+                result.answer = response['output_text']
+        except Exception as e:
+            self._fail(result, e)
+        return result
+
+    def _stream_prompt(self, user_question, docs):
+        """Formats the same prompt the "stuff" chain would send for these documents."""
+        context = "\n\n".join(doc.page_content for doc in docs)
+        return QA_PROMPT_TEMPLATE.format(context=context, question=user_question)
+
+    def stream_query(self, user_question, username, api_key):
+        """Like query(), but returns an AnswerStream yielding the answer as it is generated."""
+        result = QueryResult(question=user_question, model=LLM_MODEL)
+
+        def chunks():
+            try:
+                with timed(result.timings, "total"):
+                    docs = self.retrieve(user_question, username, api_key, result)
+                    if docs is None:
+                        return
+                    if not self._gate_passes(username, result):
+                        yield result.answer
+                        return
+                    model = self.clients.chat_model(api_key)
+                    result.logs.append(_format_docs_log("LLM Query", user_question, docs, "End Context"))
+                    with timed(result.timings, "generate"):
+                        for chunk in model.stream(self._stream_prompt(user_question, docs)):
+                            if chunk.content:
+                                result.answer += chunk.content
+                                yield chunk.content
+            except Exception as e:
+                self._fail(result, e)
+
+        return AnswerStream(result, chunks())
+
+    # --- asyncio API ---
+
+    async def aingest(self, sources, username, api_key, workers=1, progress=None):
+        """Async ingest(); the blocking work runs in a worker thread."""
+        return await asyncio.to_thread(self.ingest, sources, username, api_key, workers, progress)
+
+    async def aquery(self, user_question, username, api_key):
+        """Async query(); the blocking work runs in a worker thread."""
+        return await asyncio.to_thread(self.query, user_question, username, api_key)
+
+    def astream_query(self, user_question, username, api_key):
+        """Async stream_query(); returns an AsyncAnswerStream."""
+        result = QueryResult(question=user_question, model=LLM_MODEL)
+
+        async def chunks():
+            try:
+                with timed(result.timings, "total"):
+                    docs = await asyncio.to_thread(self.retrieve, user_question, username, api_key, result)
+                    if docs is None:
+                        return
+                    if not await asyncio.to_thread(self._gate_passes, username, result):
+                        yield result.answer
+                        return
+                    model = self.clients.chat_model(api_key)
+                    result.logs.append(_format_docs_log("LLM Query", user_question, docs, "End Context"))
+                    with timed(result.timings, "generate"):
+                        async for chunk in model.astream(self._stream_prompt(user_question, docs)):
+                            if chunk.content:
+                                result.answer += chunk.content
+                                yield chunk.content
+            except Exception as e:
+                self._fail(result, e)
+
+        return AsyncAnswerStream(result, chunks())
+
+    # --- Browsing ---
+
+    def browse_chunks(self, username, page=1, page_size=10, source=None, search=None):
+        """Returns one page of the user's chunks, optionally filtered by source file and text.
+           Reads from SQLite, so neither the FAISS index nor an API client is loaded.
+        """
+        sources = get_chunk_sources(username)
+        if not sources and store.vector_store_exists(username):
+            # Store built before chunks were recorded in SQLite: copy them over once
+            replace_user_chunks(username, [
+                (chunk_source, chunk_index, content, content_hash(content))
+                for chunk_source, chunk_index, content in store.read_docstore_chunks(username)
+            ])
+            sources = get_chunk_sources(username)
+        chunk_page = ChunkPage(rows=[], total=count_chunks(username, source, search), page=page,
+                               page_size=page_size, sources=sources)
+        chunk_page.page = min(max(1, page), chunk_page.page_count)
+        chunk_page.rows = get_chunk_page(username, page_size, (chunk_page.page - 1) * page_size, source, search)
+        return chunk_page
+
+
+# --- Process-wide engine ---
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Returns the process-wide RAGEngine, creating it on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RAGEngine(snapshot_store=snapshots.get_snapshot_store())
+        return _engine
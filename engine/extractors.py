@@ -0,0 +1,253 @@
+import io
+import multiprocessing
+import os
+import threading
+
+from config import PDF_EXTRACTION_BACKEND, PDF_PAGE_TIMEOUT
+
+# --- PDF Extraction Backends ---
+# Each backend opens a document from an in-memory file and extracts one page at a
+# time, so a per-page timeout can skip a bad page without stalling the batch.
+# Only PyPDF2 is a hard dependency; the others are imported when first selected.
+
+class PDFExtractor:
+    """Base class for text extraction backends."""
+    name = None
+    # Whether two threads of one process may extract with this backend at once.
+    # Backends wrapping non-thread-safe C libraries set this to False, and
+    # in-process extraction with them is then serialised by a process-wide lock.
+    thread_safe = True
+
+    def open(self, fileobj):
+        raise NotImplementedError
+
+    def page_count(self, document):
+        raise NotImplementedError
+
+    def page_text(self, document, index):
+        raise NotImplementedError
+
+    def close(self, document):
+        pass
+
+
+class PyPDF2Extractor(PDFExtractor):
+    name = "pypdf2"
+
+    def open(self, fileobj):
+        from PyPDF2 import PdfReader
+        return PdfReader(fileobj)
+
+    def page_count(self, document):
+        return len(document.pages)
+
+    def page_text(self, document, index):
+        return document.pages[index].extract_text() or ""
+
+
+class PdfiumExtractor(PDFExtractor):
+    name = "pypdfium2"
+    thread_safe = False # PDFium itself must not be called from two threads at once
+
+    def open(self, fileobj):
+        try:
+            import pypdfium2
+        except ImportError:
+            raise ImportError("The 'pypdfium2' PDF backend needs the pypdfium2 package (pip install pypdfium2).")
+        return pypdfium2.PdfDocument(fileobj)
+
+    def page_count(self, document):
+        return len(document)
+
+    def page_text(self, document, index):
+        page = document[index]
+        try:
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_range()
+            finally:
+                textpage.close()
+        finally:
+            page.close()
+
+    def close(self, document):
+        document.close()
+
+
+class PdfMinerExtractor(PDFExtractor):
+    name = "pdfminer"
+
+    def open(self, fileobj):
+        try:
+            from pdfminer.pdfparser import PDFParser
+            from pdfminer.pdfdocument import PDFDocument
+            from pdfminer.pdfpage import PDFPage
+        except ImportError:
+            raise ImportError("The 'pdfminer' PDF backend needs the pdfminer.six package (pip install pdfminer.six).")
+        return list(PDFPage.create_pages(PDFDocument(PDFParser(fileobj))))
+
+    def page_count(self, document):
+        return len(document)
+
+    def page_text(self, document, index):
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams, LTTextContainer
+        from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+        # A fresh interpreter per page keeps pages independent of each other
+        resource_manager = PDFResourceManager()
+        device = PDFPageAggregator(resource_manager, laparams=LAParams())
+        PDFPageInterpreter(resource_manager, device).process_page(document[index])
+        layout = device.get_result()
+        return "".join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+
+
+EXTRACTORS = {
+    extractor.name: extractor
+    for extractor in (PyPDF2Extractor(), PdfiumExtractor(), PdfMinerExtractor())
+}
+
+def get_extractor(name=None):
+    """Returns the backend registered under name (default: PDF_EXTRACTION_BACKEND)."""
+    name = name or PDF_EXTRACTION_BACKEND
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF extraction backend '{name}'. Choose one of: {', '.join(EXTRACTORS)}.")
+    return EXTRACTORS[name]
+
+
+# --- Extraction with per-page timeouts ---
+# A stuck page can't be interrupted inside the process running it, so with a
+# timeout every document is parsed in a child process that is killed when a page
+# overruns. A replacement child then carries on from the next page. The parent
+# never calls the backend itself, so a killed call can't leave a C library
+# (e.g. PDFium) half-way through something in this process.
+
+_in_process_locks = {}  # backend name -> lock serialising in-process use of non-thread-safe backends
+
+def _read_bytes(fileobj):
+    """Reads a path or file-like object fully so the document can be reopened after a timeout."""
+    if isinstance(fileobj, (str, os.PathLike)):
+        with open(fileobj, "rb") as f:
+            return f.read()
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    return fileobj.read()
+
+def process_context():
+    """Multiprocessing context for extraction processes, including pools whose workers extract.
+       forkserver children start from a clean single-threaded server, so they are safe to
+       create from threaded hosts like Streamlit and from each other; spawn is the fallback.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+def _extract_pages_worker(conn, extractor, data, first_page):
+    """Child process: opens the document, then sends ("count", n), one ("page", index, text)
+       or ("error", index, message) per page from first_page on, and finally ("done",).
+       A failure to open the document is sent as ("open_error", exception).
+    """
+    try:
+        document = extractor.open(io.BytesIO(data))
+        total_pages = extractor.page_count(document)
+    except Exception as e:
+        try:
+            conn.send(("open_error", e))
+        except Exception:
+            conn.send(("open_error", RuntimeError(str(e))))
+        return
+    conn.send(("count", total_pages))
+    for index in range(first_page, total_pages):
+        try:
+            conn.send(("page", index, extractor.page_text(document, index) or ""))
+        except Exception as e:
+            conn.send(("error", index, str(e)))
+    extractor.close(document)
+    conn.send(("done",))
+
+def _extract_isolated(extractor, data, page_timeout):
+    """Extracts every page in killable child processes; returns (page_texts, skipped_pages)."""
+    context = process_context()
+    page_texts = []
+    skipped_pages = []
+    total_pages = None
+    next_page = 0
+    while total_pages is None or next_page < total_pages:
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(target=_extract_pages_worker, args=(child_conn, extractor, data, next_page), daemon=True)
+        process.start()
+        child_conn.close()
+        stopped = None  # Why this child ended before finishing the document
+        try:
+            while stopped is None:
+                # Opening the document gets the same allowance as one page
+                if not parent_conn.poll(page_timeout):
+                    stopped = f"timed out after {page_timeout}s"
+                    break
+                try:
+                    message = parent_conn.recv()
+                except EOFError:
+                    stopped = "extraction process exited unexpectedly"
+                    break
+                if message[0] == "open_error":
+                    raise message[1]
+                elif message[0] == "count":
+                    total_pages = message[1]
+                elif message[0] == "page":
+                    if message[2]: page_texts.append(message[2])
+                    next_page = message[1] + 1
+                elif message[0] == "error":
+                    skipped_pages.append((message[1] + 1, f"error: {message[2]}"))
+                    next_page = message[1] + 1
+                elif message[0] == "done":
+                    return page_texts, skipped_pages
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            parent_conn.close()
+        if total_pages is None:
+            raise RuntimeError(f"Could not open PDF: {stopped}")
+        if next_page < total_pages:
+            skipped_pages.append((next_page + 1, stopped))
+            next_page += 1
+    return page_texts, skipped_pages
+
+def _extract_in_process(extractor, data):
+    """Extracts every page on the calling thread; returns (page_texts, skipped_pages)."""
+    lock = None if extractor.thread_safe else _in_process_locks.setdefault(extractor.name, threading.Lock())
+    if lock:
+        lock.acquire()
+    try:
+        document = extractor.open(io.BytesIO(data))
+        page_texts = []
+        skipped_pages = []
+        try:
+            for index in range(extractor.page_count(document)):
+                try:
+                    page_text = extractor.page_text(document, index)
+                except Exception as e:
+                    skipped_pages.append((index + 1, f"error: {e}"))
+                    continue
+                if page_text: page_texts.append(page_text)
+        finally:
+            extractor.close(document)
+        return page_texts, skipped_pages
+    finally:
+        if lock:
+            lock.release()
+
+def extract_text(fileobj, backend=None, page_timeout=PDF_PAGE_TIMEOUT):
+    """Extracts text from every page of a PDF (path or file-like object).
+
+    Returns (text, skipped_pages) where skipped_pages lists (page_number, reason)
+    for pages that failed or exceeded page_timeout seconds. With a timeout the
+    document is parsed in a child process that is killed on overrun; page_timeout
+    None parses it in this process. Errors opening the document are raised to the caller.
+    """
+    extractor = get_extractor(backend)
+    data = _read_bytes(fileobj)
+    if page_timeout:
+        page_texts, skipped_pages = _extract_isolated(extractor, data, page_timeout)
+    else:
+        page_texts, skipped_pages = _extract_in_process(extractor, data)
+    text = "".join(page_text + "\n" for page_text in page_texts)
+    return text, skipped_pages
@@ -0,0 +1,40 @@
+import hashlib
+import json
+
+from config import CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL
+
+# --- Index Fingerprints ---
+# A fingerprint is a short hash of the settings that produced part of an index.
+# Comparing the fingerprints in an index's manifest with the current config tells
+# whether its chunks must be re-split, only re-embedded, or can be left alone.
+
+SPLITTER_NAME = "RecursiveCharacterTextSplitter"
+
+# Index statuses returned by index_status()
+CURRENT = "current"    # Built with the current splitter and embedding settings
+REEMBED = "reembed"    # Same chunks, different embedding model
+RESPLIT = "resplit"    # Chunk settings changed (or no manifest): split and embed again
+
+def _fingerprint(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def splitter_settings(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    return {"splitter": SPLITTER_NAME, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+
+def splitter_fingerprint(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    return _fingerprint(splitter_settings(chunk_size, chunk_overlap))
+
+def embedding_fingerprint(model=EMBEDDING_MODEL):
+    return _fingerprint({"embedding_model": model})
+
+def content_hash(text):
+    """Identifies a chunk's text so its embedding can be reused when the same text reappears."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def index_status(manifest):
+    """Compares a saved manifest with the current config; returns CURRENT, REEMBED or RESPLIT."""
+    if not manifest or manifest.get("splitter_fingerprint") != splitter_fingerprint():
+        return RESPLIT
+    if manifest.get("embedding_fingerprint") != embedding_fingerprint():
+        return REEMBED
+    return CURRENT
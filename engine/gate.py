@@ -0,0 +1,34 @@
+from config import RELEVANCE_GATE_ENABLED, RELEVANCE_THRESHOLD
+from db import add_gate_decision
+
+# --- Relevance Gate ---
+
+class RelevanceGate:
+    """Decides from retrieval scores whether a question is worth sending to the LLM.
+
+    A question passes when at least one retrieved chunk has a cosine similarity of
+    `threshold` or more. Every decision is stored in the relevance_gate_log table
+    (see `python cli.py gate-stats`), including while the gate is disabled, so the
+    threshold can be tuned on real traffic before it is enforced.
+    """
+
+    def __init__(self, threshold=RELEVANCE_THRESHOLD, enabled=RELEVANCE_GATE_ENABLED):
+        self.threshold = threshold
+        self.enabled = enabled
+
+    def passes(self, scores):
+        return any(score >= self.threshold for score in scores)
+
+    def check(self, username, result):
+        """Records the decision for a retrieved QueryResult; returns False if the LLM should be skipped."""
+        passed = self.passes(result.scores)
+        max_score = max(result.scores) if result.scores else None
+        outcome = "passed" if passed else ("blocked" if self.enabled else "would block (gate disabled)")
+        result.logs.append(f"Relevance gate {outcome}: max score {max_score}, threshold {self.threshold}, "
+                           f"scores {result.scores}")
+        try:
+            add_gate_decision(username, result.question, self.threshold, result.scores, passed, self.enabled)
+        except Exception as e:
+            # Losing a tuning record must never fail the question itself
+            result.logs.append(f"WARNING: could not record relevance gate decision: {e}")
+        return passed or not self.enabled
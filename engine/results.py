@@ -0,0 +1,66 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# --- Result Types ---
+# Plain data returned by the engine so any front end (Streamlit, CLI, HTTP) can
+# decide for itself how to present messages, logs and timings.
+
+@dataclass
+class IngestResult:
+    """Outcome of ingesting a batch of PDFs for one user."""
+    username: str
+    added: list = field(default_factory=list)     # Filenames newly stored in the DB
+    skipped: list = field(default_factory=list)   # (filename, reason) tuples
+    errors: list = field(default_factory=list)    # (filename, message) tuples
+    chunk_count: int = 0
+    embedded_count: int = 0                       # Chunks sent to the embeddings API (the rest were reused)
+    index_status: str = None                      # Set by reindex(): "current", "reembed" or "resplit"
+    version: str = None                           # Index version built and made live, if any
+    success: bool = False
+    error: str = None                             # Fatal error that stopped the ingest
+    timings: dict = field(default_factory=dict)   # Stage name -> seconds
+    logs: list = field(default_factory=list)
+
+
+@dataclass
+class QueryResult:
+    """Answer to a single question, with the chunks it was grounded on."""
+    question: str
+    answer: str = ""
+    model: str = ""
+    sources: list = field(default_factory=list)    # [{"source": filename, "chunk_index": i}, ...]
+    documents: list = field(default_factory=list)  # Retrieved LangChain Document objects
+    scores: list = field(default_factory=list)     # Cosine similarity of each document to the question
+    gated: bool = False                            # True if the relevance gate answered without the LLM
+    error: str = None
+    timings: dict = field(default_factory=dict)
+    logs: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+@dataclass
+class ChunkPage:
+    """One page of a user's stored chunks for browsing."""
+    rows: list                 # (source, chunk_index, content) tuples
+    total: int                 # Chunks matching the filters
+    page: int                  # 1-based page number actually returned
+    page_size: int
+    sources: list = field(default_factory=list)  # Every source file, for the filter control
+
+    @property
+    def page_count(self):
+        return max(1, -(-self.total // self.page_size))
+
+
+@contextmanager
+def timed(timings, stage):
+    """Records the wall-clock duration of a block under timings[stage]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round(time.perf_counter() - start, 4)
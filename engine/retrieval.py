@@ -0,0 +1,65 @@
+import numpy as np
+
+# --- Two-stage (hierarchical) retrieval ---
+# Stage one scores one centroid vector per PDF and keeps the best documents;
+# stage two runs MMR over only those documents' chunks. Everything here works on
+# plain numpy arrays so it can be benchmarked without FAISS or an API key.
+
+def normalize(vectors):
+    """L2-normalizes rows (or a single vector) so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def build_document_index(vectors, sources):
+    """Computes one normalized centroid per source from its chunks' vectors.
+       Returns (doc_sources, centroids) with centroids[i] belonging to doc_sources[i].
+    """
+    vectors = normalize(vectors)
+    doc_sources = sorted(set(sources))
+    row_of = {source: i for i, source in enumerate(doc_sources)}
+    centroids = np.zeros((len(doc_sources), vectors.shape[1]), dtype=np.float32)
+    counts = np.zeros(len(doc_sources), dtype=np.float32)
+    for vector, source in zip(vectors, sources):
+        centroids[row_of[source]] += vector
+        counts[row_of[source]] += 1
+    return doc_sources, normalize(centroids / counts[:, None])
+
+def select_documents(query_vector, centroids, top_n):
+    """Indices of the top_n documents whose centroids are most similar to the query."""
+    scores = centroids @ normalize(query_vector)
+    top_n = min(top_n, len(scores))
+    best = np.argpartition(-scores, top_n - 1)[:top_n]
+    return best[np.argsort(-scores[best])]
+
+def maximal_marginal_relevance(query_vector, candidate_vectors, k, lambda_mult=0.5):
+    """Picks k candidate rows balancing similarity to the query against redundancy.
+       Expects normalized inputs; returns indices into candidate_vectors in pick order.
+    """
+    if len(candidate_vectors) == 0:
+        return []
+    query_scores = candidate_vectors @ query_vector
+    selected = [int(np.argmax(query_scores))]
+    # Highest similarity of every candidate to anything already selected
+    redundancy = candidate_vectors @ candidate_vectors[selected[0]]
+    while len(selected) < min(k, len(candidate_vectors)):
+        mmr_scores = lambda_mult * query_scores - (1 - lambda_mult) * redundancy
+        mmr_scores[selected] = -np.inf
+        best = int(np.argmax(mmr_scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, candidate_vectors @ candidate_vectors[best])
+    return selected
+
+def search_chunks(query_vector, chunk_vectors, k, fetch_k, lambda_mult=0.5):
+    """MMR search over a subset of chunks: takes the fetch_k most similar, then k by MMR.
+       Returns (indices into chunk_vectors, cosine similarity of each to the query).
+    """
+    query_vector = normalize(query_vector)
+    chunk_vectors = normalize(chunk_vectors)
+    scores = chunk_vectors @ query_vector
+    fetch_k = min(fetch_k, len(scores))
+    candidates = np.argpartition(-scores, fetch_k - 1)[:fetch_k]
+    candidates = candidates[np.argsort(-scores[candidates])]
+    picked = maximal_marginal_relevance(query_vector, chunk_vectors[candidates], k, lambda_mult)
+    indices = candidates[picked]
+    return indices, scores[indices]
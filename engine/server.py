@@ -0,0 +1,171 @@
+import json
+import os
+import urllib.parse
+import urllib.request
+from base64 import b64decode, b64encode
+from dataclasses import fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from config import ENGINE_TIMEOUT
+from engine.core import AnswerStream, _source_file, _source_name, get_engine
+from engine.results import ChunkPage, IngestResult, QueryResult
+
+# --- Engine Service ---
+# A thin HTTP/JSON front for one RAGEngine, so several app processes (or another
+# front end) share a single engine and its warm index and client caches:
+#
+#   POST /query    {"question", "username", "api_key"}            -> QueryResult
+#   POST /stream   same body; NDJSON {"chunk": text} lines, then {"result": QueryResult}
+#   POST /ingest   {"username", "api_key", "files": [{"filename", "data" (base64)}]} -> IngestResult
+#   GET  /chunks   ?username=&page=&page_size=&source=&search=   -> ChunkPage
+#   GET  /health
+#
+# Each request runs on its own server thread against the engine's thread-safe sync
+# API (what aquery/astream_query/aingest wrap). Requests carry API keys, so bind it
+# to localhost or a private network. RemoteEngine below is the matching client.
+
+def _result_json(result):
+    """A result dataclass as JSON-ready data; LangChain documents stay on the server."""
+    return {f.name: getattr(result, f.name) for f in fields(result) if f.name != "documents"}
+
+
+class EngineRequestHandler(BaseHTTPRequestHandler):
+    """Routes requests to self.server.engine."""
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            if url.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif url.path == "/chunks":
+                chunk_page = self.server.engine.browse_chunks(
+                    params["username"], int(params.get("page", 1)), int(params.get("page_size", 10)),
+                    params.get("source"), params.get("search")
+                )
+                self._send_json(200, _result_json(chunk_page))
+            else:
+                self._send_json(404, {"error": f"Unknown path '{url.path}'."})
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+            engine = self.server.engine
+            if self.path == "/query":
+                result = engine.query(request["question"], request["username"], request["api_key"])
+                self._send_json(200, _result_json(result))
+            elif self.path == "/stream":
+                stream = engine.stream_query(request["question"], request["username"], request["api_key"])
+                # No Content-Length: the body ends when the connection closes
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for chunk in stream:
+                    self.wfile.write((json.dumps({"chunk": chunk}) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write((json.dumps({"result": _result_json(stream.result)}) + "\n").encode("utf-8"))
+            elif self.path == "/ingest":
+                sources = [(f["filename"], BytesIO(b64decode(f["data"]))) for f in request["files"]]
+                result = engine.ingest(sources, request["username"], request["api_key"])
+                self._send_json(200, _result_json(result))
+            else:
+                self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+
+def make_server(host, port, engine=None):
+    """Returns a threaded HTTP server for the engine (the process-wide one by default)."""
+    server = ThreadingHTTPServer((host, port), EngineRequestHandler)
+    server.daemon_threads = True
+    server.engine = engine or get_engine()
+    return server
+
+
+# --- Client ---
+
+def _source_bytes(source):
+    fileobj = _source_file(source)
+    if isinstance(fileobj, (str, os.PathLike)):
+        with open(fileobj, "rb") as f:
+            return f.read()
+    fileobj.seek(0)
+    return fileobj.read()
+
+
+class RemoteEngine:
+    """Calls an engine service (`python cli.py serve`) with the RAGEngine methods the app uses.
+
+    Results come back as the same dataclasses, without LangChain documents. Like the
+    engine, query/stream_query/ingest report failures (including an unreachable
+    service) on the result; browse_chunks raises them.
+    """
+
+    def __init__(self, url, timeout=ENGINE_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _open(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _call(self, path, payload=None):
+        with self._open(path, payload) as response:
+            return json.load(response)
+
+    def query(self, user_question, username, api_key):
+        try:
+            return QueryResult(**self._call("/query", {"question": user_question, "username": username, "api_key": api_key}))
+        except Exception as e:
+            return QueryResult(question=user_question, error=f"Engine service request failed: {e}")
+
+    def stream_query(self, user_question, username, api_key):
+        result = QueryResult(question=user_question)
+
+        def chunks():
+            try:
+                payload = {"question": user_question, "username": username, "api_key": api_key}
+                with self._open("/stream", payload) as response:
+                    for line in response:
+                        message = json.loads(line)
+                        if "chunk" in message:
+                            yield message["chunk"]
+                        else:
+                            vars(result).update(vars(QueryResult(**message["result"])))
+            except Exception as e:
+                result.error = f"Engine service request failed: {e}"
+
+        return AnswerStream(result, chunks())
+
+    def ingest(self, sources, username, api_key):
+        try:
+            files = [{"filename": _source_name(source), "data": b64encode(_source_bytes(source)).decode("ascii")}
+                     for source in sources]
+            return IngestResult(**self._call("/ingest", {"username": username, "api_key": api_key, "files": files}))
+        except Exception as e:
+            return IngestResult(username=username, error=f"Engine service request failed: {e}")
+
+    def browse_chunks(self, username, page=1, page_size=10, source=None, search=None):
+        params = {"username": username, "page": page, "page_size": page_size}
+        params.update({key: value for key, value in (("source", source), ("search", search)) if value})
+        return ChunkPage(**self._call("/chunks?" + urllib.parse.urlencode(params)))
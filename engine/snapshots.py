@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+from datetime import datetime
+
+from config import SNAPSHOT_STORE, SNAPSHOT_STORE_PATH, SNAPSHOTS_KEPT
+from engine import store
+
+# --- Index Snapshots ---
+# A snapshot is one index version packed into a single .tar.gz archive, described
+# by a JSON manifest (version, sha256 checksum, size, chunk count and the build
+# fingerprints). The process that builds an index publishes it to a SnapshotStore;
+# serving replicas pull the newest snapshot into their own versions/ directory
+# and switch CURRENT to it, so no filesystem has to be shared between them.
+
+ARCHIVE_SUFFIX = ".tar.gz"
+
+# sync_snapshot() outcomes
+SYNC_CURRENT = "current"    # The local index is the newest snapshot, or newer than it
+SYNC_UPDATED = "updated"    # A newer snapshot was pulled and is now live
+SYNC_MISSING = "missing"    # Nothing has been published for the user
+
+
+def build_order(manifest):
+    """Sort key telling which of two index manifests is newer: the build sequence, then
+       the build time, then the version name. Manifests from before build sequences sort first.
+    """
+    manifest = manifest or {}
+    return (manifest.get("build_sequence", 0), manifest.get("built_at", ""), manifest.get("version", ""))
+
+
+class SnapshotStore:
+    """Base class for places snapshots are published to and pulled from.
+       Implementations must make a snapshot visible to latest() only after its
+       archive and manifest are completely stored, and latest() must be the
+       newest snapshot by build_order, whatever order publishers finish in.
+    """
+    name = None
+
+    def put(self, username, archive_path, manifest):
+        raise NotImplementedError
+
+    def latest(self, username):
+        """Manifest of the user's newest snapshot, or None."""
+        raise NotImplementedError
+
+    def fetch(self, username, version, dest_path):
+        """Downloads the archive of one snapshot to dest_path."""
+        raise NotImplementedError
+
+    def usernames(self):
+        raise NotImplementedError
+
+    def prune(self, username, keep):
+        pass
+
+
+class LocalDirSnapshotStore(SnapshotStore):
+    """Snapshots in a directory tree: <root>/<username>/<version>.tar.gz and <version>.json,
+       with a LATEST file naming the newest version. Serves single-host setups and tests,
+       or several hosts when root is a shared mount.
+    """
+    name = "local"
+
+    def __init__(self, root=SNAPSHOT_STORE_PATH):
+        self.root = root
+
+    def _user_dir(self, username):
+        return os.path.join(self.root, username)
+
+    def put(self, username, archive_path, manifest):
+        user_dir = self._user_dir(username)
+        os.makedirs(user_dir, exist_ok=True)
+        version = manifest["version"]
+        # Archive and manifest first; LATEST only moves once both are complete
+        tmp_archive = os.path.join(user_dir, f".{version}{ARCHIVE_SUFFIX}.tmp")
+        shutil.copyfile(archive_path, tmp_archive)
+        os.replace(tmp_archive, os.path.join(user_dir, version + ARCHIVE_SUFFIX))
+        store.write_atomic(os.path.join(user_dir, f"{version}.json"), json.dumps(manifest, indent=2))
+        # A slower publisher finishing an older build must not move LATEST backwards
+        if build_order(manifest) > build_order(self.latest(username)):
+            store.write_atomic(os.path.join(user_dir, "LATEST"), version)
+
+    def latest(self, username):
+        latest_path = os.path.join(self._user_dir(username), "LATEST")
+        if not os.path.exists(latest_path):
+            return None
+        with open(latest_path, "r", encoding="utf-8") as f:
+            version = f.read().strip()
+        with open(os.path.join(self._user_dir(username), f"{version}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def fetch(self, username, version, dest_path):
+        shutil.copyfile(os.path.join(self._user_dir(username), version + ARCHIVE_SUFFIX), dest_path)
+
+    def usernames(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, "LATEST")))
+
+    def _manifests(self, username):
+        user_dir = self._user_dir(username)
+        manifests = []
+        for name in os.listdir(user_dir):
+            if name.endswith(".json") and not name.startswith("."):
+                with open(os.path.join(user_dir, name), "r", encoding="utf-8") as f:
+                    manifests.append(json.load(f))
+        return manifests
+
+    def prune(self, username, keep):
+        user_dir = self._user_dir(username)
+        latest = self.latest(username)
+        # Oldest first by build_order: version names carry the builder's clock, which can be skewed
+        manifests = sorted(self._manifests(username), key=build_order)
+        old_versions = [manifest["version"] for manifest in manifests
+                        if not latest or manifest["version"] != latest["version"]]
+        for version in old_versions[:max(0, len(old_versions) - max(0, keep - 1))]:
+            for filename in (version + ARCHIVE_SUFFIX, f"{version}.json"):
+                path = os.path.join(user_dir, filename)
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+SNAPSHOT_STORES = {store_class.name: store_class for store_class in (LocalDirSnapshotStore,)}
+
+def get_snapshot_store(name=SNAPSHOT_STORE, location=SNAPSHOT_STORE_PATH):
+    """Returns the snapshot store registered under name, or None when snapshots are disabled."""
+    if not name:
+        return None
+    if name not in SNAPSHOT_STORES:
+        raise ValueError(f"Unknown snapshot store '{name}'. Choose one of: {', '.join(SNAPSHOT_STORES)}.")
+    return SNAPSHOT_STORES[name](location)
+
+
+# --- Packing and syncing ---
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def pack_snapshot(username, version, dest_dir):
+    """Packs one local index version into dest_dir. Returns (archive path, snapshot manifest)."""
+    version_path = store.get_version_path(username, version)
+    archive_path = os.path.join(dest_dir, version + ARCHIVE_SUFFIX)
+    with tarfile.open(archive_path, "w:gz") as archive:
+        for filename in store.INDEX_FILES:
+            path = os.path.join(version_path, filename)
+            if os.path.exists(path):
+                archive.add(path, arcname=filename)
+    manifest = dict(store.load_manifest(username, version) or {})
+    manifest.update({
+        "username": username,
+        "version": version,
+        "chunk_count": manifest.get("chunk_count"),
+        "sha256": _file_sha256(archive_path),
+        "size": os.path.getsize(archive_path),
+        "published_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    return archive_path, manifest
+
+def publish_snapshot(snapshot_store, username, version=None, keep=SNAPSHOTS_KEPT):
+    """Publishes the user's live index (or `version`) and returns its snapshot manifest."""
+    version = version or store.current_version(username)
+    if not version:
+        raise ValueError(f"'{username}' has no versioned index to publish; rebuild it first.")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive_path, manifest = pack_snapshot(username, version, tmp_dir)
+        snapshot_store.put(username, archive_path, manifest)
+    snapshot_store.prune(username, keep)
+    return manifest
+
+def _extract_archive(archive_path, dest_dir):
+    """Unpacks a snapshot archive, accepting only the plain index files it should contain."""
+    with tarfile.open(archive_path, "r:gz") as archive:
+        for member in archive.getmembers():
+            if not member.isfile() or member.name not in store.INDEX_FILES:
+                raise ValueError(f"Unexpected entry '{member.name}' in snapshot archive.")
+            with archive.extractfile(member) as src, open(os.path.join(dest_dir, member.name), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+def sync_snapshot(snapshot_store, username):
+    """Makes the user's newest published snapshot the live local index, if it is newer
+       (by build_order) than the live one; sync never moves an index backwards, so a
+       local build that failed to publish isn't replaced by an older snapshot.
+       Returns SYNC_CURRENT, SYNC_UPDATED or SYNC_MISSING. A snapshot whose checksum
+       doesn't match its manifest raises ValueError and leaves the live index alone.
+    """
+    manifest = snapshot_store.latest(username)
+    if not manifest:
+        return SYNC_MISSING
+    if build_order(manifest) <= build_order(store.load_manifest(username)):
+        return SYNC_CURRENT
+    version = manifest["version"]
+    if version in store.list_versions(username):
+        # Pulled before and still on disk (e.g. after a local rollback)
+        store.commit_version(username, version, store.get_version_path(username, version))
+        return SYNC_UPDATED
+
+    staging_path = store.stage_version(username, version)
+    try:
+        archive_path = os.path.join(staging_path, version + ARCHIVE_SUFFIX)
+        snapshot_store.fetch(username, version, archive_path)
+        if os.path.getsize(archive_path) != manifest["size"] or _file_sha256(archive_path) != manifest["sha256"]:
+            raise ValueError(f"Snapshot {version} for '{username}' failed its checksum; keeping the current index.")
+        _extract_archive(archive_path, staging_path)
+        os.remove(archive_path)
+        store.commit_version(username, version, staging_path)
+    except Exception:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+    return SYNC_UPDATED
@@ -0,0 +1,292 @@
+import json
+import os
+import pickle
+import secrets
+import shutil
+from datetime import datetime
+
+from config import CHUNK_SIZE, CHUNK_OVERLAP, VECTOR_DB_PATH, INDEX_VERSIONS_KEPT
+
+DOC_INDEX_FILE = "doc_index.npz"
+MANIFEST_FILE = "manifest.json"
+INDEX_FILES = ("index.faiss", "index.pkl", DOC_INDEX_FILE, MANIFEST_FILE)
+
+# --- Vector Store Management ---
+# LangChain and FAISS are imported inside the functions that need them so that
+# importing the engine (e.g. for the CLI or the login page) stays cheap.
+#
+# Every build is written to its own directory, VECTOR_DB_PATH/<username>/versions/<version>,
+# and goes live when the CURRENT file next to it is atomically replaced with the new
+# version name. Readers therefore never see a half-written index, and a process that
+# already loaded the previous version keeps using it until it notices the switch.
+
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+STAGING_PREFIX = ".staging-"
+
+def get_user_vector_store_path(username):
+    """Returns the path for the user-specific vector store."""
+    return os.path.join(VECTOR_DB_PATH, username)
+
+def get_version_path(username, version):
+    """Directory holding the files of one index version."""
+    return os.path.join(get_user_vector_store_path(username), VERSIONS_DIR, version)
+
+def write_atomic(path, text):
+    """Replaces a small text file so readers see either the old or the new content."""
+    tmp_path = f"{path}.tmp-{os.getpid()}-{secrets.token_hex(4)}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def current_version(username):
+    """Name of the user's live index version, or None if no versioned index is live."""
+    path = os.path.join(get_user_vector_store_path(username), CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip() or None
+
+def current_index(username):
+    """Returns (version, path) of the index readers should use, or None if there is none.
+       Indexes saved before versioning live directly in the user's directory; their
+       version is derived from the index file's mtime so rebuilds are still noticed.
+    """
+    version = current_version(username)
+    if version:
+        return version, get_version_path(username, version)
+    legacy_path = get_user_vector_store_path(username)
+    index_path = os.path.join(legacy_path, "index.faiss")
+    if os.path.exists(index_path):
+        return f"legacy-{os.path.getmtime(index_path)}", legacy_path
+    return None
+
+def vector_store_exists(username):
+    """True if both FAISS files are present in the user's live index."""
+    current = current_index(username)
+    return (current is not None
+            and os.path.exists(os.path.join(current[1], "index.faiss"))
+            and os.path.exists(os.path.join(current[1], "index.pkl")))
+
+def new_version():
+    """A fresh version name; names sort in build order."""
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{secrets.token_hex(3)}"
+
+def stage_version(username, version):
+    """Creates an empty staging directory for a version being built and returns its path."""
+    staging_path = os.path.join(get_user_vector_store_path(username), VERSIONS_DIR, STAGING_PREFIX + version)
+    os.makedirs(staging_path)
+    return staging_path
+
+def commit_version(username, version, staging_path):
+    """Moves a fully written staging directory into place and makes it the live version.
+       Older versions beyond INDEX_VERSIONS_KEPT are then deleted.
+    """
+    version_path = get_version_path(username, version)
+    if os.path.abspath(staging_path) != os.path.abspath(version_path):
+        os.rename(staging_path, version_path)
+    write_atomic(os.path.join(get_user_vector_store_path(username), CURRENT_FILE), version)
+    # The unversioned layout is superseded once a version is live
+    for filename in INDEX_FILES:
+        legacy_file = os.path.join(get_user_vector_store_path(username), filename)
+        if os.path.exists(legacy_file):
+            os.remove(legacy_file)
+    prune_versions(username)
+    return version_path
+
+def activate_version(username, version):
+    """Makes a version that is still on disk live again, e.g. to roll back a bad build."""
+    if version not in list_versions(username):
+        raise ValueError(f"Version '{version}' of '{username}' is not on disk; available: {', '.join(list_versions(username))}.")
+    return commit_version(username, version, get_version_path(username, version))
+
+def list_versions(username):
+    """Committed version names for the user, oldest first."""
+    versions_path = os.path.join(get_user_vector_store_path(username), VERSIONS_DIR)
+    if not os.path.isdir(versions_path):
+        return []
+    return sorted(name for name in os.listdir(versions_path)
+                  if not name.startswith(STAGING_PREFIX) and os.path.isdir(os.path.join(versions_path, name)))
+
+def prune_versions(username, keep=INDEX_VERSIONS_KEPT):
+    """Deletes all but the newest `keep` versions, never the live one.
+       Loaded indexes live in memory, so deleting a version doesn't affect queries already using it.
+    """
+    live = current_version(username)
+    old_versions = [version for version in list_versions(username) if version != live]
+    for version in old_versions[:max(0, len(old_versions) - max(0, keep - 1))]:
+        shutil.rmtree(get_version_path(username, version), ignore_errors=True)
+
+def split_documents(pdf_data, logs):
+    """Splits [(filename, text), ...] into Document chunks tagged with source metadata."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_core.documents import Document
+    all_docs = []
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    for filename, text in pdf_data:
+        if not text or not text.strip():
+            logs.append(f"Skipping '{filename}': No text content.")
+            continue
+        logs.append(f"Splitting text from '{filename}'...")
+        chunks = text_splitter.split_text(text)
+        logs.append(f" -> Created {len(chunks)} chunks.")
+        for i, chunk in enumerate(chunks):
+            # Create LangChain Document object with metadata
+            all_docs.append(Document(
+                page_content=chunk,
+                metadata={"source": filename, "chunk_index": i} # Add source filename and chunk index
+            ))
+    return all_docs
+
+def documents_from_chunks(chunks):
+    """Rebuilds Document objects from stored (source, chunk_index, content) rows."""
+    from langchain_core.documents import Document
+    return [
+        Document(page_content=content, metadata={"source": source, "chunk_index": chunk_index})
+        for source, chunk_index, content in chunks
+    ]
+
+def build_vector_store(docs, vectors, embeddings):
+    """Builds an in-memory FAISS store from documents and their precomputed vectors.
+       The embeddings client is kept by the store for embedding queries later.
+    """
+    from langchain_community.vectorstores import FAISS
+    texts = [doc.page_content for doc in docs]
+    return FAISS.from_embeddings(
+        list(zip(texts, vectors)), embeddings, metadatas=[doc.metadata for doc in docs]
+    )
+
+def save_vector_store(index_path, vector_store):
+    """Writes the FAISS store to an index directory and returns that path."""
+    if not os.path.exists(index_path):
+        os.makedirs(index_path)
+    vector_store.save_local(index_path)
+    return index_path
+
+# --- Index Manifest ---
+
+def save_manifest(index_path, manifest):
+    """Writes the manifest describing how the index in index_path was built."""
+    if not os.path.exists(index_path):
+        os.makedirs(index_path)
+    with open(os.path.join(index_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+def load_manifest(username, version=None):
+    """Returns the manifest of the user's live index (or of `version`),
+       or None for indexes built before manifests existed.
+    """
+    if version:
+        index_path = get_version_path(username, version)
+    else:
+        current = current_index(username)
+        if current is None:
+            return None
+        index_path = current[1]
+    path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# --- Document Index (per-PDF centroids for two-stage retrieval) ---
+
+def save_document_index(index_path, vectors, sources):
+    """Computes and saves one centroid vector per source PDF. Returns the number of documents."""
+    import numpy as np
+    from engine.retrieval import build_document_index
+    doc_sources, centroids = build_document_index(vectors, sources)
+    if not os.path.exists(index_path):
+        os.makedirs(index_path)
+    np.savez(os.path.join(index_path, DOC_INDEX_FILE), sources=np.array(doc_sources), centroids=centroids)
+    return len(doc_sources)
+
+def load_document_index(index_path):
+    """Returns (doc_sources, centroids), or None for stores built without a document index."""
+    path = os.path.join(index_path, DOC_INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    import numpy as np
+    with np.load(path) as data:
+        return [str(source) for source in data["sources"]], data["centroids"]
+
+
+class UserIndex:
+    """A user's loaded FAISS store plus the document index used for two-stage retrieval."""
+
+    def __init__(self, vector_store, document_index=None):
+        self.vector_store = vector_store
+        self.doc_sources, self.doc_centroids = document_index or (None, None)
+        self._positions_by_source = None
+
+    @property
+    def document_count(self):
+        return len(self.doc_sources) if self.doc_sources else 0
+
+    def positions_for(self, sources):
+        """FAISS row positions of every chunk belonging to the given source files."""
+        if self._positions_by_source is None:
+            # Built on first two-stage query; concurrent builders produce the same mapping
+            positions_by_source = {}
+            for position, doc_id in self.vector_store.index_to_docstore_id.items():
+                source = self.vector_store.docstore.search(doc_id).metadata.get("source")
+                positions_by_source.setdefault(source, []).append(position)
+            self._positions_by_source = positions_by_source
+        return [p for source in sources for p in self._positions_by_source.get(source, [])]
+
+    def nearest_positions(self, query_vector, count):
+        """FAISS row positions of the `count` chunks nearest to the query across the whole store."""
+        import numpy as np
+        _, ids = self.vector_store.index.search(np.asarray([query_vector], dtype=np.float32), count)
+        return [int(position) for position in ids[0] if position >= 0]
+
+    def chunk_vectors(self, positions):
+        """Reads the stored vectors for the given FAISS positions."""
+        import numpy as np
+        index = self.vector_store.index
+        return np.vstack([index.reconstruct(int(position)) for position in positions])
+
+    def documents(self, positions):
+        """The LangChain Documents stored at the given FAISS positions."""
+        docstore, ids = self.vector_store.docstore, self.vector_store.index_to_docstore_id
+        return [docstore.search(ids[int(position)]) for position in positions]
+
+
+def load_user_index(index_path, embeddings):
+    """Loads the FAISS store and document index in index_path, or returns None if there is no store.
+       Load errors are raised to the caller.
+    """
+    if not os.path.exists(os.path.join(index_path, "index.faiss")):
+        return None
+    from langchain_community.vectorstores import FAISS
+    vector_store = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    return UserIndex(vector_store, load_document_index(index_path))
+
+def read_index_vectors(username):
+    """Reads every vector of the live FAISS index, in row order (the order of read_docstore_chunks)."""
+    current = current_index(username)
+    if current is None:
+        return None
+    import faiss
+    index = faiss.read_index(os.path.join(current[1], "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+def read_docstore_chunks(username):
+    """Reads (source, chunk_index, content) for every chunk from the live index's docstore pickle.
+       Only index.pkl is read: the FAISS index and an embeddings client are not needed.
+    """
+    current = current_index(username)
+    if current is None:
+        return []
+    pkl_path = os.path.join(current[1], "index.pkl")
+    if not os.path.exists(pkl_path):
+        return []
+    with open(pkl_path, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    chunks = []
+    for position in sorted(index_to_docstore_id):
+        doc = docstore.search(index_to_docstore_id[position])
+        chunks.append((doc.metadata.get("source", ""), doc.metadata.get("chunk_index", position), doc.page_content))
+    return chunks
@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# The app's modules live at the repository root rather than in an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from engine import store
+from engine.snapshots import LocalDirSnapshotStore
+
+
+@pytest.fixture
+def vector_root(tmp_path, monkeypatch):
+    """Points the engine's vector store directory at a fresh temporary directory."""
+    root = tmp_path / "faiss_index"
+    root.mkdir()
+    monkeypatch.setattr(store, "VECTOR_DB_PATH", str(root))
+    return root
+
+@pytest.fixture
+def snapshot_store(tmp_path):
+    return LocalDirSnapshotStore(str(tmp_path / "snapshots"))
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_NAME", str(tmp_path / "user_data.db"))
+    monkeypatch.setattr(db, "VECTOR_DB_PATH", str(tmp_path / "faiss_index"))
+    db.init_db()
+    return db
+
+
+# --- Stand-in index building (LangChain isn't needed) ---
+# Documents are SimpleNamespaces, a "vector store" is its (docs, vectors), and the
+# saved index.faiss / index.pkl hold the vectors and chunk rows as .npy and JSON.
+
+def _documents(rows):
+    return [SimpleNamespace(page_content=content, metadata={"source": source, "chunk_index": chunk_index})
+            for source, chunk_index, content in rows]
+
+def _split_documents(pdf_data, logs):
+    return _documents([(filename, i, line) for filename, text in pdf_data
+                       for i, line in enumerate(line for line in text.splitlines() if line.strip())])
+
+def _save_vector_store(index_path, vector_store):
+    docs, vectors = vector_store
+    with open(os.path.join(index_path, "index.faiss"), "wb") as f:
+        np.save(f, np.vstack(vectors))
+    with open(os.path.join(index_path, "index.pkl"), "w", encoding="utf-8") as f:
+        json.dump([[doc.metadata["source"], doc.metadata["chunk_index"], doc.page_content] for doc in docs], f)
+    return index_path
+
+def _read_docstore_chunks(username):
+    with open(os.path.join(store.current_index(username)[1], "index.pkl"), encoding="utf-8") as f:
+        return [tuple(row) for row in json.load(f)]
+
+def _read_index_vectors(username):
+    with open(os.path.join(store.current_index(username)[1], "index.faiss"), "rb") as f:
+        return np.load(f)
+
+
+class FakeEmbeddings:
+    """Deterministic 4-dimensional embeddings that record every text sent for embedding."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[len(text), sum(map(ord, text)) % 97, 1.0, 0.0] for text in texts]
+
+
+class FakeClients:
+    def __init__(self):
+        self.embedding_client = FakeEmbeddings()
+
+    def embeddings(self, api_key):
+        return self.embedding_client
+
+
+@pytest.fixture
+def fake_index(monkeypatch):
+    """Replaces the LangChain/FAISS parts of engine.store with the stand-ins above."""
+    monkeypatch.setattr(store, "split_documents", _split_documents)
+    monkeypatch.setattr(store, "documents_from_chunks", _documents)
+    monkeypatch.setattr(store, "build_vector_store", lambda docs, vectors, embeddings: (docs, vectors))
+    monkeypatch.setattr(store, "save_vector_store", _save_vector_store)
+    monkeypatch.setattr(store, "read_docstore_chunks", _read_docstore_chunks)
+    monkeypatch.setattr(store, "read_index_vectors", _read_index_vectors)
+    return FakeClients()
@@ -0,0 +1,23 @@
+import pytest
+
+from cli import read_questions
+
+
+def test_read_questions_accepts_objects_and_strings(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text('{"id": "q1", "question": "Why?"}\n\n"How?"\n{"question": "When?"}\n', encoding="utf-8")
+    assert read_questions(path) == [
+        {"id": "q1", "question": "Why?"}, {"question": "How?", "id": 3}, {"question": "When?", "id": 4}
+    ]
+
+def test_read_questions_reports_every_invalid_line_up_front(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text('{"question": "Why?"}\n{"id": 2}\n42\n{"question": \n["a"]\n{"question": ""}\n', encoding="utf-8")
+    with pytest.raises(SystemExit) as exit_info:
+        read_questions(path)
+    message = str(exit_info.value)
+    for expected in ('line 2: missing a "question" string', "line 3: expected an object or a string, not int",
+                     "line 4: invalid JSON", "line 5: expected an object or a string, not list",
+                     'line 6: missing a "question" string'):
+        assert expected in message
+    assert "line 1" not in message
@@ -0,0 +1,21 @@
+import os
+import threading
+
+from engine import core
+from engine.core import RAGEngine
+from engine.results import IngestResult
+
+
+def test_parallel_extraction_with_a_page_timeout_uses_threads(monkeypatch):
+    # Each document already gets its own killable child process from extract_text,
+    # so the pool only has to wait on them: no second layer of worker processes
+    monkeypatch.setattr(core, "PDF_PAGE_TIMEOUT", 30)
+    barrier = threading.Barrier(2, timeout=5)
+    def extract_pdf_text(source):
+        barrier.wait()  # Both files are being extracted at the same time
+        return f"{source[0]} from {os.getpid()}", []
+    monkeypatch.setattr(core, "extract_pdf_text", extract_pdf_text)
+
+    result = IngestResult(username="alice")
+    extracted = RAGEngine(clients=object()).extract([("a.pdf", None), ("b.pdf", None)], result, workers=2)
+    assert sorted(extracted) == [("a.pdf", f"a.pdf from {os.getpid()}"), ("b.pdf", f"b.pdf from {os.getpid()}")]
@@ -0,0 +1,101 @@
+import json
+import os
+
+import pytest
+
+from config import EMBEDDING_MODEL
+from engine import store
+from engine.core import RAGEngine
+from engine.fingerprint import (
+    CURRENT, REEMBED, RESPLIT, embedding_fingerprint, index_status, splitter_fingerprint
+)
+from engine.results import IngestResult
+
+
+@pytest.fixture
+def engine(vector_root, database, fake_index):
+    return RAGEngine(clients=fake_index)
+
+def build(engine, username="alice", resplit=True):
+    result = IngestResult(username=username)
+    assert engine.rebuild(username, "key", result, resplit=resplit) is not None
+    return result
+
+def embedded(engine):
+    return engine.clients.embedding_client.embedded
+
+
+# --- Index status ---
+
+def test_index_status_compares_manifest_fingerprints():
+    current = {"splitter_fingerprint": splitter_fingerprint(), "embedding_fingerprint": embedding_fingerprint()}
+    assert index_status(current) == CURRENT
+    assert index_status(dict(current, embedding_fingerprint=embedding_fingerprint("old-model"))) == REEMBED
+    assert index_status(dict(current, splitter_fingerprint=splitter_fingerprint(chunk_size=1))) == RESPLIT
+    assert index_status(None) == RESPLIT
+
+
+# --- Embedding reuse ---
+
+def test_rebuild_embeds_only_chunks_without_a_cached_embedding(engine, database):
+    database.add_pdf_record("alice", "a.pdf", "alpha one\nalpha two")
+    assert build(engine).embedded_count == 2
+
+    database.add_pdf_record("alice", "b.pdf", "beta one\nalpha two")
+    embedded(engine).clear()
+    result = build(engine)
+    assert embedded(engine) == ["beta one"]
+    assert (result.embedded_count, result.chunk_count) == (1, 4)
+
+def test_embeddings_are_cached_batch_by_batch(engine, database, monkeypatch):
+    database.add_pdf_record("alice", "a.pdf", "one\ntwo\nthree")
+    engine.embed_batch_size = 1
+    embed_documents = engine.clients.embedding_client.embed_documents
+    def fail_on_third_batch(texts):
+        if texts == ["three"]:
+            raise RuntimeError("rate limited")
+        return embed_documents(texts)
+    monkeypatch.setattr(engine.clients.embedding_client, "embed_documents", fail_on_third_batch)
+    with pytest.raises(RuntimeError):
+        build(engine)
+    assert len(database.get_chunk_embeddings("alice", EMBEDDING_MODEL)) == 2
+
+    monkeypatch.setattr(engine.clients.embedding_client, "embed_documents", embed_documents)
+    embedded(engine).clear()
+    build(engine)
+    assert embedded(engine) == ["three"]
+
+
+# --- Reindex ---
+
+def test_rebuild_without_resplit_reuses_stored_chunks(engine, database, monkeypatch):
+    database.add_pdf_record("alice", "a.pdf", "alpha one\nalpha two")
+    build(engine)
+    monkeypatch.setattr(store, "split_documents", lambda *args: pytest.fail("stored chunks should be reused"))
+    embedded(engine).clear()
+
+    result = build(engine, resplit=False)
+    assert result.chunk_count == 2 and embedded(engine) == []
+    assert store.load_manifest("alice")["version"] == result.version
+
+def test_reindex_leaves_current_indexes_alone(engine, database):
+    database.add_pdf_record("alice", "a.pdf", "alpha one")
+    live = build(engine).version
+    result = engine.reindex("alice", "key")
+    assert (result.success, result.index_status, result.version) == (True, CURRENT, None)
+    assert store.current_version("alice") == live
+
+def test_reindex_reembeds_stored_chunks_after_an_embedding_change(engine, database, monkeypatch):
+    database.add_pdf_record("alice", "a.pdf", "alpha one")
+    build(engine)
+    manifest_path = os.path.join(store.current_index("alice")[1], store.MANIFEST_FILE)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["embedding_fingerprint"] = embedding_fingerprint("old-model")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    monkeypatch.setattr(store, "split_documents", lambda *args: pytest.fail("stored chunks should be reused"))
+
+    result = engine.reindex("alice", "key")
+    assert (result.success, result.index_status) == (True, REEMBED)
+    assert index_status(store.load_manifest("alice")) == CURRENT
@@ -0,0 +1,83 @@
+import io
+import threading
+
+import pytest
+
+from engine.core import AnswerStream
+from engine.results import ChunkPage, IngestResult, QueryResult
+from engine.server import RemoteEngine, make_server
+
+
+class RecordingEngine:
+    """Answers like a RAGEngine and records what the service passed to it."""
+
+    def __init__(self):
+        self.ingested = None
+
+    def query(self, user_question, username, api_key):
+        return QueryResult(question=user_question, answer=f"{username} asked with {api_key}",
+                           documents=[object()], sources=[{"source": "a.pdf", "chunk_index": 0}],
+                           timings={"total": 0.5})
+
+    def stream_query(self, user_question, username, api_key):
+        result = QueryResult(question=user_question)
+
+        def chunks():
+            for chunk in ("Hel", "lo"):
+                result.answer += chunk
+                yield chunk
+
+        return AnswerStream(result, chunks())
+
+    def ingest(self, sources, username, api_key):
+        self.ingested = [(filename, fileobj.read()) for filename, fileobj in sources]
+        return IngestResult(username=username, added=[filename for filename, _ in sources],
+                            skipped=[("old.pdf", "exists")], success=True)
+
+    def browse_chunks(self, username, page=1, page_size=10, source=None, search=None):
+        return ChunkPage(rows=[(source, page, search)], total=25, page=page, page_size=page_size, sources=["a.pdf"])
+
+
+@pytest.fixture
+def service():
+    engine = RecordingEngine()
+    server = make_server("127.0.0.1", 0, engine)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield engine, RemoteEngine(f"http://127.0.0.1:{server.server_port}", timeout=5)
+    server.shutdown()
+    server.server_close()
+
+
+def test_query_round_trip(service):
+    _, remote = service
+    result = remote.query("why?", "alice", "key")
+    assert result.ok and result.answer == "alice asked with key"
+    assert result.sources == [{"source": "a.pdf", "chunk_index": 0}] and result.documents == []
+    assert result.timings == {"total": 0.5}
+
+def test_stream_query_yields_chunks_then_fills_the_result(service):
+    _, remote = service
+    stream = remote.stream_query("why?", "alice", "key")
+    assert list(stream) == ["Hel", "lo"]
+    assert stream.result.ok and stream.result.answer == "Hello"
+
+def test_ingest_sends_file_contents(service, tmp_path):
+    engine, remote = service
+    path = tmp_path / "b.pdf"
+    path.write_bytes(b"%PDF path")
+    result = remote.ingest([path, ("a.pdf", io.BytesIO(b"%PDF upload"))], "alice", "key")
+    assert result.success and result.added == ["b.pdf", "a.pdf"]
+    assert [tuple(skipped) for skipped in result.skipped] == [("old.pdf", "exists")]
+    assert engine.ingested == [("b.pdf", b"%PDF path"), ("a.pdf", b"%PDF upload")]
+
+def test_browse_chunks(service):
+    _, remote = service
+    chunk_page = remote.browse_chunks("alice", page=2, page_size=10, search="needle")
+    assert chunk_page.rows == [[None, 2, "needle"]] and chunk_page.page_count == 3
+
+def test_unreachable_service_is_reported_on_the_result():
+    remote = RemoteEngine("http://127.0.0.1:9", timeout=1)
+    result = remote.query("why?", "alice", "key")
+    assert not result.ok and "Engine service request failed" in result.error
+    assert "Engine service request failed" in remote.ingest([], "alice", "key").error
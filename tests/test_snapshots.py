@@ -0,0 +1,233 @@
+import io
+import os
+import tarfile
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from engine import snapshots, store
+from engine.core import RAGEngine
+from engine.fingerprint import content_hash
+from engine.results import IngestResult, QueryResult
+
+
+def build_version(username, payload, build_sequence, version=None):
+    """Writes a stand-in index version (no FAISS needed) and makes it live."""
+    version = version or store.new_version()
+    staging_path = store.stage_version(username, version)
+    for filename in ("index.faiss", "index.pkl"):
+        with open(os.path.join(staging_path, filename), "w", encoding="utf-8") as f:
+            f.write(payload)
+    store.save_manifest(staging_path, {
+        "username": username, "version": version, "build_sequence": build_sequence,
+        "chunk_count": 3, "embedding_model": "test-model", "splitter_fingerprint": "fp",
+    })
+    store.commit_version(username, version, staging_path)
+    return version
+
+def read_live(username, filename="index.faiss"):
+    with open(os.path.join(store.current_index(username)[1], filename), encoding="utf-8") as f:
+        return f.read()
+
+
+# --- Local versions ---
+
+def test_commit_switches_current_and_prunes_old_versions(vector_root):
+    versions = [build_version("alice", f"v{i}", i + 1) for i in range(3)]
+    assert store.current_version("alice") == versions[-1]
+    assert store.list_versions("alice") == versions[-store.INDEX_VERSIONS_KEPT:]
+    assert read_live("alice") == "v2"
+    assert not [name for name in os.listdir(vector_root / "alice" / "versions") if name.startswith(store.STAGING_PREFIX)]
+
+def test_legacy_index_is_served_until_first_version(vector_root):
+    legacy = vector_root / "alice"
+    legacy.mkdir()
+    (legacy / "index.faiss").write_text("legacy")
+    (legacy / "index.pkl").write_text("legacy")
+    version, path = store.current_index("alice")
+    assert version.startswith("legacy-") and path == str(legacy)
+
+    build_version("alice", "new", 1)
+    assert read_live("alice") == "new"
+    assert not (legacy / "index.faiss").exists()
+
+def test_activate_version_rolls_back(vector_root):
+    first = build_version("alice", "first", 1)
+    build_version("alice", "second", 2)
+    store.activate_version("alice", first)
+    assert read_live("alice") == "first"
+    with pytest.raises(ValueError):
+        store.activate_version("alice", "no-such-version")
+
+
+# --- Publishing and syncing ---
+
+def switch_replica(monkeypatch, tmp_path, name):
+    root = tmp_path / name
+    root.mkdir(exist_ok=True)
+    monkeypatch.setattr(store, "VECTOR_DB_PATH", str(root))
+
+def test_publish_and_sync_to_replica(vector_root, snapshot_store, monkeypatch, tmp_path):
+    version = build_version("alice", "built", 1)
+    manifest = snapshots.publish_snapshot(snapshot_store, "alice")
+    assert manifest["version"] == version and manifest["chunk_count"] == 3 and len(manifest["sha256"]) == 64
+
+    switch_replica(monkeypatch, tmp_path, "replica")
+    assert snapshots.sync_snapshot(snapshot_store, "alice") == snapshots.SYNC_UPDATED
+    assert store.current_version("alice") == version
+    assert read_live("alice") == "built"
+    assert snapshots.sync_snapshot(snapshot_store, "alice") == snapshots.SYNC_CURRENT
+    assert snapshots.sync_snapshot(snapshot_store, "bob") == snapshots.SYNC_MISSING
+
+def test_sync_never_rolls_back_a_newer_local_build(vector_root, snapshot_store):
+    build_version("alice", "published", 1)
+    snapshots.publish_snapshot(snapshot_store, "alice")
+    unpublished = build_version("alice", "unpublished", 2)  # e.g. its publish failed
+
+    assert snapshots.sync_snapshot(snapshot_store, "alice") == snapshots.SYNC_CURRENT
+    assert store.current_version("alice") == unpublished
+
+def test_sync_rejects_a_snapshot_with_a_bad_checksum(vector_root, snapshot_store, monkeypatch, tmp_path):
+    version = build_version("alice", "built", 1)
+    snapshots.publish_snapshot(snapshot_store, "alice")
+    switch_replica(monkeypatch, tmp_path, "replica")
+    live = build_version("alice", "replica's own", 0)
+
+    archive = os.path.join(snapshot_store.root, "alice", version + snapshots.ARCHIVE_SUFFIX)
+    with open(archive, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last_byte = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last_byte[0] ^ 0xFF]))
+    with pytest.raises(ValueError, match="checksum"):
+        snapshots.sync_snapshot(snapshot_store, "alice")
+    assert store.current_version("alice") == live
+    assert store.list_versions("alice") == [live]
+
+def test_archive_members_outside_the_index_files_are_rejected(tmp_path):
+    archive_path = tmp_path / "evil.tar.gz"
+    with tarfile.open(archive_path, "w:gz") as archive:
+        data = b"overwrite"
+        member = tarfile.TarInfo("../index.faiss")
+        member.size = len(data)
+        archive.addfile(member, io.BytesIO(data))
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    with pytest.raises(ValueError, match="Unexpected entry"):
+        snapshots._extract_archive(str(archive_path), str(dest))
+    assert not (tmp_path / "index.faiss").exists()
+
+def test_snapshot_store_keeps_only_recent_snapshots(vector_root, snapshot_store):
+    for i in range(4):
+        build_version("alice", f"v{i}", i + 1)
+        latest = snapshots.publish_snapshot(snapshot_store, "alice", keep=2)
+    kept = sorted(name for name in os.listdir(os.path.join(snapshot_store.root, "alice")) if name.endswith(".json"))
+    assert len(kept) == 2
+    assert snapshot_store.latest("alice")["version"] == latest["version"]
+
+def test_older_publish_finishing_late_does_not_move_latest_back(vector_root, snapshot_store):
+    # The older build's version name sorts last, as if its builder's clock ran ahead
+    older = build_version("alice", "older", 1, version="29990101T000000000000-aaaaaa")
+    build_version("alice", "newer", 2, version="20000101T000000000000-bbbbbb")
+    snapshots.publish_snapshot(snapshot_store, "alice")
+    newer = snapshot_store.latest("alice")
+
+    snapshots.publish_snapshot(snapshot_store, "alice", version=older, keep=1)
+    assert snapshot_store.latest("alice")["version"] == newer["version"]
+    kept = os.listdir(os.path.join(snapshot_store.root, "alice"))
+    assert f"{newer['version']}.json" in kept and f"{older}.json" not in kept
+
+
+# --- Engine ---
+
+def test_engine_sync_keeps_embeddings_for_pulled_chunks(vector_root, snapshot_store, database, monkeypatch):
+    build_version("alice", "built", 1)
+    snapshots.publish_snapshot(snapshot_store, "alice")
+    # The stand-in index has no real docstore or FAISS file to read back
+    chunks = [("a.pdf", 0, "first chunk"), ("a.pdf", 1, "second chunk")]
+    vectors = np.array([[1, 0], [0, 1]], dtype=np.float32)
+    monkeypatch.setattr(store, "read_docstore_chunks", lambda username: chunks)
+    monkeypatch.setattr(store, "read_index_vectors", lambda username: vectors)
+    database.add_chunk_embeddings("alice", "test-model", [("unrelated", b"kept")])
+    monkeypatch.setattr(store, "VECTOR_DB_PATH", str(vector_root.parent / "replica"))
+
+    engine = RAGEngine(clients=object(), snapshot_store=snapshot_store)
+    assert engine.sync("alice") == snapshots.SYNC_UPDATED
+
+    assert database.get_user_chunks("alice") == chunks
+    cached = database.get_chunk_embeddings("alice", "test-model")
+    assert cached["unrelated"] == b"kept"
+    assert np.frombuffer(cached[content_hash("second chunk")], dtype=np.float32).tolist() == [0, 1]
+
+
+def switch_replica_database(database, monkeypatch, tmp_path, name):
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / f"{name}.db"))
+    database.init_db()
+
+def test_build_on_a_replica_keeps_documents_ingested_on_another(vector_root, snapshot_store, database, fake_index,
+                                                                 monkeypatch, tmp_path):
+    engine = RAGEngine(clients=fake_index, snapshot_store=snapshot_store)
+    database.add_pdf_record("alice", "a.pdf", "alpha one\nalpha two")
+    engine.rebuild("alice", "key", IngestResult(username="alice"))
+
+    switch_replica(monkeypatch, tmp_path, "replica")
+    switch_replica_database(database, monkeypatch, tmp_path, "replica")
+    database.add_pdf_record("alice", "b.pdf", "beta one")
+    fake_index.embedding_client.embedded.clear()
+    result = IngestResult(username="alice")
+    RAGEngine(clients=fake_index, snapshot_store=snapshot_store).rebuild("alice", "key", result)
+
+    assert snapshot_store.latest("alice")["version"] == result.version
+    assert snapshot_store.latest("alice")["sources"] == ["a.pdf", "b.pdf"]
+    assert [chunk[2] for chunk in database.get_user_chunks("alice")] == ["beta one", "alpha one", "alpha two"]
+    assert fake_index.embedding_client.embedded == ["beta one"]
+
+def test_build_missing_published_documents_is_not_published(vector_root, snapshot_store, database, fake_index,
+                                                            monkeypatch, tmp_path):
+    engine = RAGEngine(clients=fake_index, snapshot_store=snapshot_store)
+    database.add_pdf_record("alice", "a.pdf", "alpha one")
+    published = engine.rebuild("alice", "key", IngestResult(username="alice")) and snapshot_store.latest("alice")
+
+    switch_replica(monkeypatch, tmp_path, "replica")
+    switch_replica_database(database, monkeypatch, tmp_path, "replica")
+    database.add_pdf_record("alice", "b.pdf", "beta one")
+
+    def unreachable(*args):
+        raise OSError("snapshot store unreachable")
+    monkeypatch.setattr(snapshot_store, "fetch", unreachable)
+    result = IngestResult(username="alice")
+    RAGEngine(clients=fake_index, snapshot_store=snapshot_store).rebuild("alice", "key", result)
+
+    assert store.current_version("alice") == result.version
+    assert snapshot_store.latest("alice") == published
+    assert any("not published" in log and "a.pdf" in log for log in result.logs)
+
+def test_questions_do_not_wait_for_a_snapshot_pull(vector_root, snapshot_store, database, fake_index, monkeypatch, tmp_path):
+    database.add_pdf_record("alice", "a.pdf", "alpha one")
+    RAGEngine(clients=fake_index, snapshot_store=snapshot_store).rebuild("alice", "key", IngestResult(username="alice"))
+    published = snapshot_store.latest("alice")["version"]
+    switch_replica(monkeypatch, tmp_path, "replica")
+    switch_replica_database(database, monkeypatch, tmp_path, "replica")
+
+    release = threading.Event()
+    fetch = snapshot_store.fetch
+    def slow_fetch(*args):
+        release.wait(5)
+        fetch(*args)
+    monkeypatch.setattr(snapshot_store, "fetch", slow_fetch)
+    engine = RAGEngine(clients=fake_index, snapshot_store=snapshot_store, sync_interval=3600)
+
+    started = time.monotonic()
+    engine._sync_if_due("alice", QueryResult(question="q"))
+    assert time.monotonic() - started < 1
+    assert store.current_version("alice") is None
+
+    release.set()
+    engine._sync_pool.shutdown(wait=True)
+    assert store.current_version("alice") == published
+    assert [chunk[2] for chunk in database.get_user_chunks("alice")] == ["alpha one"]
+    result = QueryResult(question="q")
+    engine._sync_if_due("alice", result)
+    assert result.logs == [f"Pulled snapshot {published} for 'alice'."]
@@ -1,21 +1,27 @@
 import streamlit as st
-import pandas as pd
 import base64
+import csv
+import io
+from functools import lru_cache
 from config import ( # Import constants from config.py
     APP_TITLE, APP_ICON, USER_AVATAR, BOT_AVATAR,
-    LINKEDIN_URL,  GITHUB_URL
+    LINKEDIN_URL,  GITHUB_URL, CHAT_HISTORY_PAGE_SIZE
 )
-# Import the new function from utils
-from utils import display_vector_store_contents
+from db import get_recent_chat_messages, count_chat_messages, iter_chat_messages, clear_chat_history
+# utils is imported where it is used so rendering the login page doesn't pull in the RAG stack.
 
 # --- CSS Styling ---
+@lru_cache(maxsize=None)
+def read_css(css_file):
+    """Reads a theme stylesheet once per process."""
+    with open(css_file, 'r') as f:
+        return f.read()
+
 def load_css():
     """Loads the appropriate CSS file based on the current theme."""
     theme = st.session_state.get('theme', 'dark')
     css_file = 'dark_theme.css' if theme == 'dark' else 'light_theme.css'
-    with open(css_file, 'r') as f:
-        css = f.read()
-    return f'<style>{css}</style>'
+    return f'<style>{read_css(css_file)}</style>'
 
 # --- Chat Display Function ---
 def display_chat_message(is_user, content):
@@ -26,23 +32,46 @@ def display_chat_message(is_user, content):
         st.markdown(content)
 
 # --- Helper Functions (Download Button, Social Links) ---
-def display_download_button():
-    """Display a button to download conversation history."""
-    if st.session_state.get('conversation_history'): # Check if history exists
-        df = pd.DataFrame(
-            st.session_state.conversation_history,
-            columns=["Question", "Answer", "Model", "Timestamp", "PDF Name"]
-        )
-        csv = df.to_csv(index=False).encode('utf-8')
+def iter_chat_history_csv(username):
+    """Yields the user's chat history as CSV text, one row at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Question", "Answer", "Model", "Timestamp", "PDF Name"])
+    for row in iter_chat_messages(username):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+def display_download_button(username, has_history):
+    """Builds the chat history CSV only when asked, then offers it for download."""
+    if not has_history:
+        return
+    if st.button("📥 Export Chat History", key='export_history_button', use_container_width=True):
+        # Built only on click; Streamlit keeps the payload in memory, so plain bytes are fine
+        export_data = "".join(iter_chat_history_csv(username)).encode('utf-8')
         st.download_button(
            label="📥 Download Chat History",
-           data=csv,
+           data=export_data,
            file_name="conversation_history.csv",
            mime="text/csv",
            key='download-csv',
            use_container_width=True
         )
 
+def display_chat_history(username, total):
+    """Renders the most recent page(s) of the user's `total` stored chat messages."""
+    shown = min(total, CHAT_HISTORY_PAGE_SIZE * st.session_state.get('history_pages', 1))
+    if total > shown:
+        if st.button(f"⬆️ Load older messages ({total - shown} more)", key="load_older_messages"):
+            st.session_state.history_pages = st.session_state.get('history_pages', 1) + 1
+            st.rerun()
+    for question, answer, model_name, timestamp, pdf_name in get_recent_chat_messages(username, shown):
+        display_chat_message(True, question)
+        display_chat_message(False, answer)
+
 def display_social_links():
     """Display social media links."""
     st.markdown("##### Connect with the Developer")
@@ -54,9 +83,52 @@ def display_social_links():
         unsafe_allow_html=True # Kaggle link already removed, ensuring state
     )
 
+# --- Vector Store Browser ---
+def _reset_chunk_browser_page():
+    st.session_state.chunk_browser_page = 1
+
+def display_chunk_browser(username):
+    """Shows the user's stored chunks one page at a time with file and text filters."""
+    from utils import browse_vector_store
+
+    with st.expander("🔎 Vector Store Contents", expanded=True):
+        source = st.session_state.get('chunk_browser_source', "All files")
+        search = st.session_state.get('chunk_browser_search', "").strip()
+        chunk_page = browse_vector_store(
+            username,
+            st.session_state.get('chunk_browser_page', 1),
+            source=None if source == "All files" else source,
+            search=search or None
+        )
+        if chunk_page is None:
+            return
+
+        col1, col2, col3 = st.columns([0.4, 0.4, 0.2])
+        with col1:
+            options = ["All files"] + chunk_page.sources
+            st.selectbox("Source file", options, key="chunk_browser_source", on_change=_reset_chunk_browser_page)
+        with col2:
+            st.text_input("Search text", key="chunk_browser_search", on_change=_reset_chunk_browser_page)
+        with col3:
+            # Keep the stored page inside the valid range before the widget reads it
+            st.session_state.chunk_browser_page = chunk_page.page
+            st.number_input("Page", min_value=1, max_value=chunk_page.page_count, step=1, key="chunk_browser_page")
+
+        if not chunk_page.total:
+            st.info("No data to display in vector store.")
+            return
+
+        first = (chunk_page.page - 1) * chunk_page.page_size + 1
+        st.caption(f"Showing chunks {first}–{first + len(chunk_page.rows) - 1} of {chunk_page.total} "
+                   f"(page {chunk_page.page} of {chunk_page.page_count})")
+        for chunk_source, chunk_index, content in chunk_page.rows:
+            st.markdown(f"**{chunk_source}** · chunk {chunk_index}")
+            st.text(content)
+
 # --- Main Application UI Rendering ---
 def render_main_app(process_pdf_callback, process_question_callback):
     """Renders the main application interface after login."""
+    history_count = count_chat_messages(st.session_state.username)
 
     # --- Sidebar ---
     with st.sidebar:
@@ -102,9 +174,10 @@ def render_main_app(process_pdf_callback, process_question_callback):
             if st.button("🚪 Logout", key="logout_button", use_container_width=True):
                 # Clear session state related to login and app data
                 keys_to_clear = [
-                    'logged_in', 'username', 'api_key', 'conversation_history',
+                    'logged_in', 'username', 'api_key', 'history_pages',
                     'vector_store_created', 'processed_files', 'current_pdfs',
-                    'login_error', 'show_api_key_input', 'processed_filenames' # Clear filenames too
+                    'login_error', 'show_api_key_input', 'processed_filenames', # Clear filenames too
+                    'show_chunk_browser', 'chunk_browser_page', 'chunk_browser_source', 'chunk_browser_search'
                 ]
                 for key in keys_to_clear:
                     if key in st.session_state:
@@ -113,7 +186,8 @@ def render_main_app(process_pdf_callback, process_question_callback):
 
             # Clear Chat Button
             if st.button("🧹 Clear Chat", key="clear_chat_button", use_container_width=True):
-                st.session_state.conversation_history = []
+                clear_chat_history(st.session_state.username)
+                st.session_state.history_pages = 1
                 st.success("Chat history cleared!")
                 st.rerun()
 
@@ -125,8 +199,8 @@ def render_main_app(process_pdf_callback, process_question_callback):
                 st.session_state.theme = 'light' if st.session_state.theme == 'dark' else 'dark'
                 st.rerun() # Rerun to apply CSS changes
 
-            # Display download button
-            display_download_button()
+            # Display export/download button
+            display_download_button(st.session_state.username, history_count > 0)
 
             # Display social links
             st.markdown("<br>", unsafe_allow_html=True)
@@ -134,18 +208,11 @@ def render_main_app(process_pdf_callback, process_question_callback):
 
             st.markdown("---")
 
-            # Button to display vector store contents
-            if st.button("View Vector Store Contents", key="view_vector_store", use_container_width=True):
-                username = st.session_state.get('username')
-                api_key = st.session_state.get('api_key')
-                if not username or not api_key:
-                    st.error("User session invalid. Please log in again.")
-                else:
-                    vs_contents = display_vector_store_contents(username, api_key)
-                    if vs_contents:
-                        st.text_area("Vector Store Contents:", value=vs_contents, height=400)
-                    else:
-                        st.info("No data to display in vector store.")
+            # Button to show/hide the vector store browser in the main area
+            browser_label = "Hide Vector Store Contents" if st.session_state.get('show_chunk_browser') else "View Vector Store Contents"
+            if st.button(browser_label, key="view_vector_store", use_container_width=True):
+                st.session_state.show_chunk_browser = not st.session_state.get('show_chunk_browser', False)
+                st.rerun()
 
         st.markdown("---") # Add a divider
 
@@ -173,10 +240,11 @@ def render_main_app(process_pdf_callback, process_question_callback):
     st.markdown("---")
 
 
-    # Display existing chat messages from history
-    for question, answer, model_name, timestamp, pdf_name in st.session_state.conversation_history:
-        display_chat_message(True, question)
-        display_chat_message(False, answer)
+    if st.session_state.get('show_chunk_browser'):
+        display_chunk_browser(st.session_state.username)
+
+    # Display the most recent stored chat messages; older pages load on demand
+    display_chat_history(st.session_state.username, history_count)
 
     # Chat input
     prompt = st.chat_input(
@@ -198,5 +266,5 @@ def render_main_app(process_pdf_callback, process_question_callback):
     elif not st.session_state.get('vector_store_created', False) and not processed_files:
          # This state might occur if processing failed or hasn't happened yet
          st.warning("👈 Please click 'Process Uploaded PDFs' in the sidebar after uploading files.")
-    elif not st.session_state.conversation_history and (st.session_state.get('vector_store_created', False) or processed_files):
+    elif not history_count and (st.session_state.get('vector_store_created', False) or processed_files):
         st.info("Your PDFs are processed. Ask your first question below!")